@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import fileio
+
+# --- 設定エリア --------------------------
+# 応答キャッシュの保存先 (GitHub Actions では actions/cache で実行間に引き継ぐ)
+CACHE_DIR = os.path.join(".cache", "ai")
+
+# 有効期限。毎日同じプロンプトを送る占いなどが前日の結果を返さないよう、1日より短くしている
+CACHE_TTL_HOURS = float(os.environ.get("AI_CACHE_TTL_HOURS", 12))
+
+# 合計サイズの上限。超えたら最後に使われた時刻が古いものから削除する
+CACHE_MAX_BYTES = int(float(os.environ.get("AI_CACHE_MAX_MB", 50)) * 1024 * 1024)
+
+# AI_CACHE=0 でキャッシュを無効化
+CACHE_ENABLED = os.environ.get("AI_CACHE", "1") != "0"
+# ----------------------------------------
+
+_lock = threading.Lock()
+
+def make_key(model_name, generation_config, prompt):
+    """モデル名・生成設定・プロンプトから一意なキーを作る"""
+    payload = json.dumps([model_name, generation_config, prompt], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def get(key):
+    """有効期限内のキャッシュがあれば応答テキストを返す (なければ None)"""
+    if not CACHE_ENABLED:
+        return None
+
+    path = _path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry.get("created", 0) > CACHE_TTL_HOURS * 3600:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    # 最終利用時刻を更新 (LRU削除の基準にする)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry.get("text")
+
+def put(key, text):
+    """応答テキストを保存し、上限を超えていれば古いものを削除する"""
+    if not CACHE_ENABLED or text is None:
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(key)
+    fileio.write_json_atomic(path, {"created": time.time(), "text": text})
+    evict()
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """合計サイズが max_bytes 以下になるまで、最後に使われた時刻が古い順に削除する"""
+    with _lock:
+        try:
+            names = [n for n in os.listdir(CACHE_DIR) if n.endswith(".json")]
+        except OSError:
+            return
+
+        entries = []
+        for name in names:
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,343 @@
+import os
+import re
+import json
+import threading
+import time
+from collections import deque
+import ai_cache
+import tracing
+
+# --- 設定エリア --------------------------
+# Gemini APIの利用枠 (無料枠の gemini-2.5-flash に合わせた値。環境変数で上書き可能)
+REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_RPM", 10))
+TOKENS_PER_MINUTE = float(os.environ.get("GEMINI_TPM", 250000))
+
+# 応答の長さは事前にわからないため、1回あたりの出力トークンを多めに見積もっておく
+ESTIMATED_OUTPUT_TOKENS = 2000
+
+# 429 (利用枠超過) が返ってきたときの再試行回数と初回の待ち時間(秒)
+MAX_RETRIES = 2
+RETRY_DELAY = 10
+
+# 1回の実行で使ってよいトークン数と、応答待ちの合計秒数 (0 なら上限なし)
+RUN_TOKEN_BUDGET = int(os.environ.get("GEMINI_RUN_TOKENS", 100000))
+RUN_SECONDS_BUDGET = float(os.environ.get("GEMINI_RUN_SECONDS", 600))
+# なくてもページが成り立つ呼び出し元。予算の OPTIONAL_BUDGET_SHARE を超えたら先に止め、
+# 残りは必須の呼び出し元 (ニュース・動物コラム・あらすじ翻訳) のために取っておく
+OPTIONAL_CALL_SITES = {"nasa", "lifestyle", "market", "gourmet"}
+OPTIONAL_BUDGET_SHARE = 0.8
+# ----------------------------------------
+
+class BudgetExceeded(RuntimeError):
+    """この実行の予算 (トークン数・応答待ち時間) を使い切ったため、呼び出しを行わなかった"""
+
+class SlidingWindowLimiter:
+    """直近 window 秒の使用量が per_minute を超えないようにするリミッター
+
+    APIの枠と同じ「直近1分間の合計」で数えるので、どの1分間を取っても枠は超えず、
+    枠いっぱいの速さで呼び出せる。使用量は [使い始める時刻, 量] の列として覚えておき、
+    枠が空いていなければ、古いものが1分前より外に出て空く時刻まで待たせる。
+    """
+
+    def __init__(self, per_minute, window=60.0):
+        self.limit = per_minute
+        self.window = window
+        self.entries = deque()
+        self.used = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        """amount 分を確保し、(使えるようになるまでの待ち時間(秒), 確保した記録) を返す
+        記録は adjust で見積もりを実際の量に直すときに使う"""
+        amount = min(amount, self.limit)
+        with self.lock:
+            now = time.monotonic()
+            while self.entries and self.entries[0][0] <= now - self.window:
+                self.used -= self.entries.popleft()[1]
+
+            start = now
+            excess = self.used + amount - self.limit
+            for entry_time, entry_amount in self.entries:
+                if excess <= 0:
+                    break
+                excess -= entry_amount
+                start = entry_time + self.window
+            # 先に並んだ呼び出しより前には割り込まない (記録を時刻順に保つ)
+            if self.entries:
+                start = max(start, self.entries[-1][0])
+
+            entry = [start, amount]
+            self.entries.append(entry)
+            self.used += amount
+            return start - now, entry
+
+    def adjust(self, entry, amount):
+        """見積もりと実際の使用量の差を反映する (正なら追加で消費、負なら返却)"""
+        with self.lock:
+            if any(e is entry for e in self.entries):
+                entry[1] += amount
+                self.used += amount
+
+# プロセス全体で共有するリミッター (全モジュールの呼び出しがここを通る)
+_request_limiter = SlidingWindowLimiter(REQUESTS_PER_MINUTE)
+_token_limiter = SlidingWindowLimiter(TOKENS_PER_MINUTE)
+
+# google.generativeai は読み込みに1秒ほどかかるため、最初に呼び出すときに読み込む
+_configure_lock = threading.Lock()
+_genai = None
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "cache_hits": 0, "wait_seconds": 0.0, "call_seconds": 0.0}
+# 呼び出し元・モデルごとの使用量と、予算の使用状況 (実行中の見積もり分を含む)
+_usage = {}
+_budget_used = {"tokens": 0, "seconds": 0.0}
+_refused = set()
+
+def _configure():
+    global _genai
+    with _configure_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+            _genai = genai
+        return _genai
+
+def _acquire(estimated_tokens):
+    """リミッターの枠が空くまで待ち、(待った秒数, トークンの確保の記録) を返す"""
+    request_wait, _ = _request_limiter.reserve(1)
+    token_wait, token_entry = _token_limiter.reserve(estimated_tokens)
+    wait_seconds = max(request_wait, token_wait)
+    if wait_seconds > 0:
+        tracing.sleep(wait_seconds, "Gemini rate limit")
+    return wait_seconds, token_entry
+
+def _record(wait_seconds, call_seconds, calls=1):
+    with _stats_lock:
+        _stats["calls"] += calls
+        _stats["wait_seconds"] += wait_seconds
+        _stats["call_seconds"] += call_seconds
+
+def _usage_entry(call_site, model_name):
+    return _usage.setdefault(f"{call_site}/{model_name}", {
+        "call_site": call_site, "model": model_name, "calls": 0, "cache_hits": 0,
+        "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0, "seconds": 0.0
+    })
+
+def _reserve_budget(call_site, estimated_tokens):
+    """予算に見積もり分を確保する。足りなければ BudgetExceeded を送出する"""
+    share = OPTIONAL_BUDGET_SHARE if call_site in OPTIONAL_CALL_SITES else 1.0
+    with _stats_lock:
+        over_tokens = RUN_TOKEN_BUDGET and _budget_used["tokens"] + estimated_tokens > RUN_TOKEN_BUDGET * share
+        over_seconds = RUN_SECONDS_BUDGET and _budget_used["seconds"] >= RUN_SECONDS_BUDGET * share
+        if over_tokens or over_seconds:
+            _refused.add(call_site)
+            raise BudgetExceeded(
+                f"Gemini の予算を超えるため {call_site} の呼び出しを省略しました "
+                f"(使用済み {_budget_used['tokens']}/{RUN_TOKEN_BUDGET} トークン, "
+                f"{_budget_used['seconds']:.0f}/{RUN_SECONDS_BUDGET:.0f}秒)"
+            )
+        _budget_used["tokens"] += estimated_tokens
+
+def _account(call_site, model_name, estimated_tokens, seconds, usage=None):
+    """1回の呼び出しの使用量を記録し、予算の見積もり分を実際の値に置き換える"""
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    total_tokens = getattr(usage, "total_token_count", 0) or 0
+    with _stats_lock:
+        entry = _usage_entry(call_site, model_name)
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["output_tokens"] += total_tokens - prompt_tokens
+        entry["total_tokens"] += total_tokens
+        entry["seconds"] += seconds
+        # 使用量が返ってこなかった場合は、見積もりのまま予算に残しておく
+        if usage is not None and total_tokens:
+            _budget_used["tokens"] += total_tokens - estimated_tokens
+        _budget_used["seconds"] += seconds
+
+def generate_content(model_name, prompt, generation_config=None, call_site="other", cacheable=None):
+    """レート制限を守りながらGeminiを呼び出し、応答テキストを返す
+    同じモデル・設定・プロンプトの応答がキャッシュにあれば、APIを呼ばずにそれを返す
+    call_site (呼び出し元の名前) ごとに使用量を記録し、この実行の予算を超える呼び出しは
+    BudgetExceeded を送出して行わない
+    cacheable を指定すると、それが True を返す応答だけをキャッシュに保存・利用する
+    (壊れた応答をキャッシュから返し続けないようにするため)"""
+    with tracing.span(f"gemini {model_name}", "llm", model=model_name, call_site=call_site) as attrs:
+        return _generate_content(model_name, prompt, generation_config, call_site, cacheable, attrs)
+
+def _generate_content(model_name, prompt, generation_config, call_site, cacheable, attrs):
+    cache_key = ai_cache.make_key(model_name, generation_config, prompt)
+    cached = ai_cache.get(cache_key)
+    if cached is not None and cacheable and not cacheable(cached):
+        cached = None
+    attrs["cache_hit"] = cached is not None
+    if cached is not None:
+        with _stats_lock:
+            _stats["cache_hits"] += 1
+            _usage_entry(call_site, model_name)["cache_hits"] += 1
+        return cached
+
+    from google.api_core import exceptions as google_exceptions
+    genai = _configure()
+    model = genai.GenerativeModel(model_name, generation_config=generation_config)
+    estimated_tokens = len(prompt) + ESTIMATED_OUTPUT_TOKENS
+    _reserve_budget(call_site, estimated_tokens)
+    call_seconds = 0.0
+
+    for attempt in range(MAX_RETRIES + 1):
+        waited, token_entry = _acquire(estimated_tokens)
+        attrs["wait_seconds"] = attrs.get("wait_seconds", 0.0) + waited
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(prompt)
+        except google_exceptions.ResourceExhausted:
+            _record(waited, time.perf_counter() - start)
+            call_seconds += time.perf_counter() - start
+            if attempt == MAX_RETRIES:
+                _account(call_site, model_name, estimated_tokens, call_seconds)
+                raise
+            delay = RETRY_DELAY * (2 ** attempt)
+            print(f"⏳ Gemini APIの利用枠に達したため{delay}秒待って再試行します...")
+            attrs["retries"] = attempt + 1
+            tracing.sleep(delay, "Gemini retry")
+            _record(delay, 0.0, calls=0)
+            continue
+        except Exception:
+            _record(waited, time.perf_counter() - start)
+            _account(call_site, model_name, estimated_tokens, call_seconds + time.perf_counter() - start)
+            raise
+        _record(waited, time.perf_counter() - start)
+        call_seconds += time.perf_counter() - start
+
+        usage = getattr(response, "usage_metadata", None)
+        _account(call_site, model_name, estimated_tokens, call_seconds, usage)
+        if usage and usage.total_token_count:
+            _token_limiter.adjust(token_entry, usage.total_token_count - estimated_tokens)
+            attrs["tokens"] = usage.total_token_count
+
+        text = response.text
+        if cacheable is None or cacheable(text):
+            ai_cache.put(cache_key, text)
+        return text
+
+# --- JSON出力 ----------------------------
+
+CODE_FENCE_OPEN = re.compile(r"^```(?:json)?\s*", re.I)
+CODE_FENCE_CLOSE = re.compile(r"\s*```$")
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def _truncation_candidates(text):
+    """途中で切れたJSONを閉じ直した候補を、長いものから順に返す
+    (値の区切り・閉じ括弧の位置で切り、開いたままの括弧を閉じる)"""
+    stack = []
+    cuts = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+    # 閉じ括弧だけが足りない場合は、最後まで使って閉じる
+    if not in_string and stack:
+        cuts.append((len(text), "".join(reversed(stack))))
+    for cut, closers in reversed(cuts):
+        yield text[:cut] + closers
+
+def parse_json(text):
+    """モデルの出力をできるだけ壊さずにJSONとして読む
+
+    コードブロックの囲み、前後の余計な文章、末尾のカンマ、出力が途中で切れた場合を
+    手元で直してから読み込む。どうしても読めなければ ValueError を送出する。
+    """
+    return _parse_json(text, repair=True)
+
+def is_complete_json(text):
+    """途中で切れた部分の補修なしに JSON として読めるか"""
+    try:
+        _parse_json(text, repair=False)
+    except ValueError:
+        return False
+    return True
+
+def _parse_json(text, repair):
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    # 文字列の中の ``` を壊さないよう、囲みは出力の先頭にあるときだけ外す
+    if text.startswith("```"):
+        text = CODE_FENCE_CLOSE.sub("", CODE_FENCE_OPEN.sub("", text))
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError(f"JSONが見つかりません: {text[:80]!r}")
+    text = TRAILING_COMMA.sub(r"\1", text[min(starts):])
+
+    try:
+        # 後ろに余計な文章が続いていても、最初のJSONだけを読む
+        return json.JSONDecoder().raw_decode(text)[0]
+    except ValueError:
+        if not repair:
+            raise
+
+    for candidate in _truncation_candidates(text):
+        try:
+            value = json.loads(TRAILING_COMMA.sub(r"\1", candidate))
+        except ValueError:
+            continue
+        print("🩹 途中で切れたJSONを補修して読み込みました")
+        return value
+    raise ValueError(f"JSONとして読めません: {text[:80]!r}")
+
+def generate_json(model_name, prompt, schema, generation_config=None, call_site="other"):
+    """応答の形 (schema) を指定してGeminiを呼び出し、読み込んだJSONを返す
+
+    schema は OpenAPI 形式の dict (例: {"type": "object", "properties": {...}, "required": [...]})。
+    形を指定していても崩れた出力が返ることがあるため、読み込みは parse_json で補修しながら行う。
+    補修しないと読めない応答はキャッシュに保存しないので、次の実行では改めて生成し直す。
+    """
+    config = dict(generation_config or {})
+    config["response_mime_type"] = "application/json"
+    config["response_schema"] = schema
+    text = generate_content(model_name, prompt, generation_config=config, call_site=call_site,
+                            cacheable=is_complete_json)
+    return parse_json(text)
+
+def get_stats():
+    """リミッター待ち時間とAPI呼び出し時間の累計を返す"""
+    with _stats_lock:
+        return dict(_stats)
+
+def get_usage():
+    """呼び出し元・モデルごとの使用量と、この実行の予算の使用状況を返す"""
+    with _stats_lock:
+        return {
+            "by_call_site": [dict(entry) for _, entry in sorted(_usage.items())],
+            "budget": {
+                "tokens": RUN_TOKEN_BUDGET,
+                "seconds": RUN_SECONDS_BUDGET,
+                "used_tokens": _budget_used["tokens"],
+                "used_seconds": round(_budget_used["seconds"], 2)
+            },
+            "refused": sorted(_refused)
+        }
+
+def refused_call_sites():
+    """予算超過で呼び出しを省略した呼び出し元"""
+    with _stats_lock:
+        return set(_refused)
@@ -0,0 +1,26 @@
+import os
+import hashlib
+import fileio
+
+# 画像などの共有置き場。ファイル名に内容のハッシュを使うので、同じ画像は1つだけ保存される
+ASSET_DIR = "assets"
+
+def store_bytes(data, ext, subdir=None):
+    """データを内容ハッシュ名で保存し、サイトのルートからの相対パスを返す
+    subdir を指定すると assets/<subdir>/ の下に保存する"""
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = f"{digest}{ext}"
+    directory = os.path.join(ASSET_DIR, subdir) if subdir else ASSET_DIR
+    path = os.path.join(directory, name)
+
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        fileio.write_bytes_atomic(path, data)
+
+    return f"{ASSET_DIR}/{subdir}/{name}" if subdir else f"{ASSET_DIR}/{name}"
+
+def store_file(src_path):
+    """ファイルを内容ハッシュ名で共有置き場に保存し、サイトのルートからの相対パスを返す"""
+    with open(src_path, 'rb') as f:
+        data = f.read()
+    return store_bytes(data, os.path.splitext(src_path)[1].lower())
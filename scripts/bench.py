@@ -0,0 +1,547 @@
+"""サイト生成のベンチマーク (ネットワーク・APIキーなしで計測する)
+
+外部とのやり取りを記録済みのデータ (fixtures) で置き換え、各取得処理と main.main() を
+決まったデータで実行して、所要時間・CPU時間・最大メモリ・描画時間・ページサイズを表示する。
+
+使い方 (リポジトリのルートで実行):
+    python scripts/bench.py record            # 本番のAPIを呼んで fixtures を記録する (APIキーが必要)
+    python scripts/bench.py synth             # ダミーの fixtures を作る (記録がないとき用)
+    python scripts/bench.py run [--json out]  # fixtures を再生して計測する
+
+置き換えるのは通信そのもの (requests.Session.get / GenerativeModel.generate_content) と
+fetch_market.download_close_prices の3か所。http_client・ai_client のキャッシュ・レート制限・
+トレースは本物が動くので、その部分の遅れも計測に表れる。
+main は空の作業ディレクトリで2回実行する (1回目: キャッシュなし / 2回目: キャッシュあり)。
+各取得処理を先に計測するため、main の計測にはモジュールの読み込み時間は含まれない。
+"""
+import io
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import datetime
+import tempfile
+import statistics
+import tracemalloc
+import types
+from urllib.parse import urlsplit, urlencode, parse_qsl, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ai_cache
+import ai_client
+import main
+import render
+import snapshot
+import tracing
+
+# --- 設定エリア --------------------------
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(REPO_ROOT, "bench", "fixtures")
+# 記録するときにURLから取り除くクエリ (APIキーを fixtures に残さない)
+SECRET_PARAMS = {"key", "api_key", "apikey"}
+# テンプレートの描画時間を測るときの繰り返し回数 (中央値を使う)
+RENDER_REPEAT = 5
+# ----------------------------------------
+
+_originals = {
+    "session_get": requests.Session.get,
+}
+
+# --- fixtures の名前 ---------------------
+
+def sanitize_url(url, params=None):
+    """クエリを含めた完全なURLから、APIキーを取り除いたものを返す"""
+    url = requests.Request("GET", url, params=params).prepare().url
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def _short_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def http_fixture_names(url):
+    """(URL完全一致の名前, ホスト+パスだけで一致させる名前)"""
+    parts = urlsplit(url)
+    return f"url-{_short_hash(url)}.json", f"path-{_short_hash(parts.netloc + parts.path)}.json"
+
+def ai_fixture_names(model_name, prompt, generation_config):
+    """(プロンプト完全一致の名前, 用途 (モデル+応答の形) だけで一致させる名前)"""
+    exact = f"prompt-{ai_cache.make_key(model_name, generation_config, prompt)[:16]}.json"
+    schema = (generation_config or {}).get("response_schema")
+    use_case = f"use-{_short_hash(json.dumps([model_name, schema], sort_keys=True))}.json"
+    return exact, use_case
+
+def _read_fixture(*paths):
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except OSError:
+            continue
+    return None
+
+def _write_fixture(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+
+# --- 再生 --------------------------------
+
+def _make_response(url, fixture):
+    import base64
+    response = requests.Response()
+    response.status_code = fixture["status"]
+    response.reason = "OK" if fixture["status"] == 200 else "Replayed"
+    response.url = url
+    response.headers = CaseInsensitiveDict(fixture.get("headers", {}))
+    if "body_b64" in fixture:
+        response._content = base64.b64decode(fixture["body_b64"])
+    else:
+        response._content = fixture["body"].encode('utf-8')
+    response._content_consumed = True
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+    response.from_cache = False
+    return response
+
+def _conditional_match(fixture, request_headers):
+    """保存しておいた ETag / Last-Modified と、リクエストの条件が一致するか"""
+    headers = CaseInsensitiveDict(fixture.get("headers", {}))
+    request_headers = request_headers or {}
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    return bool(
+        (etag and request_headers.get("If-None-Match") == etag)
+        or (last_modified and request_headers.get("If-Modified-Since") == last_modified)
+    )
+
+def _usage_metadata(prompt, text, fixture):
+    """記録した使用量を返す。ダミーの fixtures には使用量がないので、文字数で見積もる"""
+    usage = dict(fixture.get("usage") or {"prompt_token_count": len(prompt), "candidates_token_count": len(text)})
+    usage.setdefault("total_token_count", usage["prompt_token_count"] + usage["candidates_token_count"])
+    return types.SimpleNamespace(**usage)
+
+def _model_args(model):
+    # GenerativeModel は受け取った設定を変換して持つため、fixtures の名前用に元の引数を覚えておく
+    return model._bench_model_name, model._bench_generation_config
+
+def install_replay(fixture_dir):
+    """3か所の外部呼び出しを fixtures の再生に置き換える
+    置き換えるのは通信そのもの (requests.Session.get と GenerativeModel.generate_content) なので、
+    http_client / ai_client のキャッシュ・リミッター・予算・トレースはそのまま計測に含まれる"""
+    import fetch_market
+    import google.generativeai as genai
+
+    def replay_session_get(session, url, params=None, headers=None, **kwargs):
+        clean = sanitize_url(url, params)
+        exact, by_path = http_fixture_names(clean)
+        fixture = _read_fixture(os.path.join(fixture_dir, "http", exact), os.path.join(fixture_dir, "http", by_path))
+        if fixture is None:
+            raise requests.ConnectionError(f"fixture がありません: {clean}")
+        if _conditional_match(fixture, headers):
+            return _make_response(clean, {"status": 304, "headers": fixture.get("headers", {}), "body": ""})
+        return _make_response(clean, fixture)
+
+    class ReplayModel(genai.GenerativeModel):
+        def __init__(self, model_name, generation_config=None, **kwargs):
+            super().__init__(model_name, generation_config=generation_config, **kwargs)
+            self._bench_model_name = model_name
+            self._bench_generation_config = generation_config
+
+        def generate_content(self, prompt, **kwargs):
+            model_name, generation_config = _model_args(self)
+            exact, use_case = ai_fixture_names(model_name, prompt, generation_config)
+            fixture = _read_fixture(os.path.join(fixture_dir, "ai", exact), os.path.join(fixture_dir, "ai", use_case))
+            if fixture is None:
+                raise RuntimeError(f"AIの fixture がありません: {model_name}")
+            return types.SimpleNamespace(
+                text=fixture["text"], usage_metadata=_usage_metadata(prompt, fixture["text"], fixture)
+            )
+
+    def replay_download_close_prices(symbols, period="1mo", start=None):
+        import pandas as pd
+        with open(os.path.join(fixture_dir, "market.json"), 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        close = pd.DataFrame({
+            s: pd.Series(stored[s]["close"], index=pd.to_datetime(stored[s]["dates"]), dtype=float)
+            for s in symbols if s in stored
+        }).sort_index()
+        if close.empty:
+            return close
+        if start:
+            return close[close.index >= pd.Timestamp(start)]
+        days = {"1mo": 31, "3mo": 92, "1y": 366}.get(period, 366)
+        return close[close.index > close.index[-1] - pd.Timedelta(days=days)]
+
+    requests.Session.get = replay_session_get
+    genai.GenerativeModel = ReplayModel
+    fetch_market.download_close_prices = replay_download_close_prices
+
+# --- 記録 --------------------------------
+
+def install_recorder(fixture_dir):
+    """3か所の外部呼び出しを、本物を呼んだうえで結果を fixtures に保存するものに置き換える"""
+    import base64
+    import fetch_market
+    import google.generativeai as genai
+    original_download = fetch_market.download_close_prices
+
+    def record_session_get(session, url, params=None, headers=None, **kwargs):
+        response = _originals["session_get"](session, url, params=params, headers=headers, **kwargs)
+        if kwargs.get("stream") or response.status_code == 304:
+            # フォントや画像などの大きなダウンロードは記録しない (画像の処理は synth の fixtures で測る)
+            return response
+        clean = sanitize_url(url, params)
+        fixture = {
+            "url": clean,
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name]
+                for name in ("Content-Type", "ETag", "Last-Modified") if name in response.headers
+            }
+        }
+        body = response.content
+        content_type = fixture["headers"].get("Content-Type", "")
+        if content_type.startswith(("text/", "application/json", "application/xml", "application/rss")):
+            fixture["body"] = body.decode(response.encoding or "utf-8", errors="replace")
+        else:
+            fixture["body_b64"] = base64.b64encode(body).decode('ascii')
+        for name in http_fixture_names(clean):
+            _write_fixture(os.path.join(fixture_dir, "http", name), fixture)
+        return response
+
+    class RecordModel(genai.GenerativeModel):
+        def __init__(self, model_name, generation_config=None, **kwargs):
+            super().__init__(model_name, generation_config=generation_config, **kwargs)
+            self._bench_model_name = model_name
+            self._bench_generation_config = generation_config
+
+        def generate_content(self, prompt, **kwargs):
+            response = super().generate_content(prompt, **kwargs)
+            model_name, generation_config = _model_args(self)
+            usage = response.usage_metadata
+            fixture = {
+                "model": model_name,
+                "text": response.text,
+                "usage": {
+                    "prompt_token_count": usage.prompt_token_count,
+                    "candidates_token_count": usage.total_token_count - usage.prompt_token_count,
+                    "total_token_count": usage.total_token_count
+                }
+            }
+            for name in ai_fixture_names(model_name, prompt, generation_config):
+                _write_fixture(os.path.join(fixture_dir, "ai", name), fixture)
+            return response
+
+    def record_download_close_prices(symbols, period="1mo", start=None):
+        close = original_download(symbols, period=period, start=start)
+        path = os.path.join(fixture_dir, "market.json")
+        stored = _read_fixture(path) or {}
+        for symbol in close.columns:
+            series = close[symbol].dropna()
+            merged = dict(zip(stored.get(symbol, {}).get("dates", []), stored.get(symbol, {}).get("close", [])))
+            merged.update(zip(series.index.strftime('%Y-%m-%d'), series.round(4).tolist()))
+            dates = sorted(merged)
+            stored[symbol] = {"dates": dates, "close": [merged[d] for d in dates]}
+        _write_fixture(path, stored)
+        return close
+
+    requests.Session.get = record_session_get
+    genai.GenerativeModel = RecordModel
+    fetch_market.download_close_prices = record_download_close_prices
+
+# --- ダミーの fixtures -------------------
+
+def _jpeg(width, height, seed):
+    from PIL import Image
+    rng = random.Random(seed)
+    # 小さなランダム画像を拡大し、写真に近い滑らかな色の変化にする
+    small = Image.new("RGB", (16, 12))
+    small.putdata([tuple(rng.randint(0, 255) for _ in range(3)) for _ in range(16 * 12)])
+    image = small.resize((width, height), Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+def synthesize(fixture_dir):
+    """記録がなくても計測できるよう、各APIの形に合わせたダミーデータを作る"""
+    import base64
+    import fetch_animal
+    import fetch_entertainment
+    import fetch_lifestyle
+    import fetch_market
+    import fetch_nasa
+    import fetch_news
+
+    rng = random.Random(0)
+    http_dir = os.path.join(fixture_dir, "http")
+    ai_dir = os.path.join(fixture_dir, "ai")
+
+    def http(url, body=None, content_type="application/json", image=None):
+        fixture = {"url": url, "status": 200, "headers": {"Content-Type": content_type}}
+        if image:
+            fixture["body_b64"] = base64.b64encode(image).decode('ascii')
+            digest = hashlib.sha256(image).hexdigest()[:16]
+        else:
+            fixture["body"] = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+            digest = _short_hash(fixture["body"])
+        # 2回目の main で条件付きGET (304) の経路も通るよう、ETag を付けておく
+        fixture["headers"]["ETag"] = f'"{digest}"'
+        # ダミーはクエリに関係なく返したいので、ホスト+パスの名前で保存する
+        _write_fixture(os.path.join(http_dir, http_fixture_names(url)[1]), fixture)
+
+    def ai(model_name, schema, data):
+        name = ai_fixture_names(model_name, "", {"response_mime_type": "application/json", "response_schema": schema})[1]
+        _write_fixture(os.path.join(ai_dir, name), {"model": model_name, "text": json.dumps(data, ensure_ascii=False)})
+
+    # ニュース (同じニュースが複数の配信元から届く様子も再現する)
+    topics = ["新モデルを発表", "データセンターを建設へ", "業務活用が拡大", "規制案を公表", "半導体の需要が増加",
+              "研究成果を発表", "提携を発表", "新サービスを開始", "資金調達を実施", "人材育成を強化",
+              "ロボットに応用", "医療分野で実証", "教育現場で導入", "翻訳精度が向上", "省電力化に成功"]
+    items = []
+    for i in range(40):
+        topic = topics[i % len(topics)]
+        source = f"配信元{i}"
+        items.append(
+            f"<item><title>企業{i % len(topics)}、生成AIの{topic} - {source}</title>"
+            f"<link>https://example.com/news/{i}</link><guid>bench-{i}</guid>"
+            f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate><source url=\"https://example.com\">{source}</source></item>"
+        )
+    http(fetch_news.get_rss_url(), f"<rss><channel>{''.join(items)}</channel></rss>", "application/rss+xml; charset=utf-8")
+    ai("gemini-2.5-flash-lite", fetch_news.NEWS_SCHEMA, {
+        "items": [{"id": i, "catch_copy": f"見出し{i}", "summary": f"要約{i}。" * 20} for i in range(fetch_news.MAX_ARTICLES)],
+        "column": "今日のAI業界の動き。" * 30
+    })
+
+    # 株価 (終値のランダムウォーク。最終日は昨日)
+    today = datetime.date.today()
+    dates = [today - datetime.timedelta(days=d) for d in range(fetch_market.HISTORY_DAYS, 0, -1)]
+    dates = [d.isoformat() for d in dates if d.weekday() < 5]
+    market = {}
+    for item in fetch_market.TARGETS.values():
+        price = rng.uniform(100, 40000)
+        closes = []
+        for _ in dates:
+            price *= 1 + rng.gauss(0, 0.01)
+            closes.append(round(price, 4))
+        market[item["symbol"]] = {"dates": dates, "close": closes}
+    _write_fixture(os.path.join(fixture_dir, "market.json"), market)
+    http("https://production.dataviz.cnn.io/index/fearandgreed/graphdata",
+         {"fear_and_greed": {"score": 55.3, "rating": "neutral"}})
+
+    # 動物・NASA
+    ai("gemini-2.5-flash", fetch_animal.COLUMNS_SCHEMA, [
+        {"theme_category": "深海生物", "theme_animal": "ダイオウイカ", "column_title": "深海の巨人", "column_text": "ダイオウイカの話。" * 30},
+        {"theme_category": "猫の秘密", "theme_animal": "三毛猫", "column_title": "三毛猫の不思議", "column_text": "三毛猫の話。" * 30}
+    ])
+    http("https://pixabay.com/api/", {"totalHits": 1, "hits": [{"webformatURL": "https://pixabay.com/get/bench.jpg"}]})
+    http("https://pixabay.com/get/bench.jpg", image=_jpeg(640, 427, 1), content_type="image/jpeg")
+    http("https://api.nasa.gov/planetary/apod", {
+        "title": "Bench Nebula", "explanation": "A nebula. " * 80,
+        "media_type": "image", "url": "https://apod.nasa.gov/apod/image/bench.jpg"
+    })
+    http("https://apod.nasa.gov/apod/image/bench.jpg", image=_jpeg(2048, 1365, 2), content_type="image/jpeg")
+    ai("gemini-2.5-flash", fetch_nasa.TRANSLATION_SCHEMA, {"title": "ベンチ星雲", "text": "星雲の解説。" * 30})
+
+    # エンタメ
+    def jikan_item(kind, i):
+        url = f"https://cdn.myanimelist.net/images/{kind}/bench/{i}.jpg"
+        http(url, image=_jpeg(225, 320, hash((kind, i)) % 1000), content_type="image/jpeg")
+        return {
+            "title": f"{kind} {i}", "title_japanese": f"作品{i}", "rank": i + 1, "url": f"https://myanimelist.net/{kind}/{i}",
+            "images": {"jpg": {"image_url": url}}, "synopsis": f"Synopsis of {kind} {i}. " * 15,
+            "score": 8.5, "genres": [{"name": "Action"}, {"name": "Drama"}], "status": "Publishing",
+            "members": 1000 - i, "episodes": 12, "source": "Manga"
+        }
+    http("https://api.jikan.moe/v4/top/manga", {"data": [jikan_item("manga", i) for i in range(5)]})
+    http("https://api.jikan.moe/v4/seasons/now", {"data": [jikan_item("anime", i) for i in range(20)]})
+    ai("gemini-2.5-flash", fetch_entertainment.SYNOPSIS_SCHEMA,
+       [{"id": i, "synopsis": f"あらすじ{i}。" * 15} for i in range(fetch_entertainment.BATCH_SIZE)])
+
+    # 生活情報 (1回の問い合わせで返る地点数は、どのバッチよりも多くしておく)
+    http("https://api.open-meteo.com/v1/forecast", [
+        {
+            "current": {"temperature_2m": round(rng.uniform(-10, 35), 1), "weather_code": rng.choice([0, 2, 45, 61, 71, 95])},
+            "daily": {
+                "weather_code": [rng.choice([0, 3, 63]) for _ in range(7)],
+                "temperature_2m_max": [round(rng.uniform(0, 35), 1) for _ in range(7)],
+                "temperature_2m_min": [round(rng.uniform(-10, 20), 1) for _ in range(7)],
+                "precipitation_probability_max": [rng.randint(0, 100) for _ in range(7)]
+            }
+        }
+        for _ in range(max(len(fetch_lifestyle.CITIES), fetch_lifestyle.BATCH_SIZE))
+    ])
+    signs = ["おひつじ座", "おうし座", "ふたご座", "かに座", "しし座", "おとめ座",
+             "てんびん座", "さそり座", "いて座", "やぎ座", "みずがめ座", "うお座"]
+    ai("gemini-2.5-flash", fetch_lifestyle.FORTUNE_SCHEMA,
+       [{"rank": i + 1, "sign": sign, "item": "ハンカチ", "comment": "良い一日"} for i, sign in enumerate(signs)])
+
+    print(f"✅ ダミーの fixtures を作成しました: {fixture_dir}")
+
+# --- 計測 --------------------------------
+
+def measure(func, memory=True):
+    """func を実行し、(結果, {"wall", "cpu", "peak_mb"}) を返す
+    peak_mb は tracemalloc で数えた Python のメモリ確保の最大値 (計測中は少し遅くなる)"""
+    random.seed(0)
+    if memory:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        result = func()
+    finally:
+        stats = {
+            "wall": time.perf_counter() - wall_start,
+            "cpu": time.process_time() - cpu_start,
+        }
+        if memory:
+            stats["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+    return result, stats
+
+def _prepare_workdir():
+    """テンプレートだけを持つ空の作業ディレクトリを作る (キャッシュも空の状態から始める)
+    使い終わったら呼び出し側で削除する"""
+    workdir = tempfile.mkdtemp(prefix="daily-portal-bench-")
+    shutil.copytree(os.path.join(REPO_ROOT, "templates"), os.path.join(workdir, "templates"))
+    return workdir
+
+def bench_sources(memory):
+    """各取得処理を1つずつ実行して計測する"""
+    import importlib
+    stages = {}
+    for source in main.SOURCES:
+        module = importlib.import_module(source["module"])
+        _, stats = measure(getattr(module, source["func"]), memory)
+        stages[source["name"]] = stats
+    return stages
+
+def bench_render(archive_dir):
+    """保存されたスナップショットから各ページを描画し、描画時間とページサイズを測る"""
+    data = snapshot.load(archive_dir)
+    env = render.create_environment("templates")
+    common_context = {"update_time": data["update_time"]}
+    pages = {}
+    for filename, title, active_tab, section, context in render.build_pages(data["sources"]):
+        samples = []
+        for _ in range(RENDER_REPEAT):
+            start = time.perf_counter()
+            html = render.render_page(env, filename, title, active_tab, context, common_context)
+            samples.append(time.perf_counter() - start)
+        with open(filename, 'rb') as f:
+            written = f.read()
+        pages[filename] = {
+            "render_ms": statistics.median(samples) * 1000,
+            "raw_kb": len(render.resolve_links(html, False).encode('utf-8')) / 1024,
+            "html_kb": len(written) / 1024,
+            "gzip_kb": len(gzip.compress(written, compresslevel=9)) / 1024,
+        }
+    return pages
+
+def run(fixture_dir, memory=True):
+    if not os.path.isdir(fixture_dir):
+        sys.exit(f"fixtures がありません: {fixture_dir}\n先に `bench.py record` か `bench.py synth` を実行してください。")
+    install_replay(fixture_dir)
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("PIXABAY_API_KEY", "bench")
+    # 再生ではAPIを呼ばないので、レート制限で待たないようにする
+    ai_client._request_limiter = ai_client.SlidingWindowLimiter(1e9)
+    ai_client._token_limiter = ai_client.SlidingWindowLimiter(1e12)
+
+    cwd = os.getcwd()
+    workdirs = []
+    report = {"fixtures": fixture_dir}
+    try:
+        print("⏱️ 各取得処理を計測中...")
+        workdirs.append(_prepare_workdir())
+        os.chdir(workdirs[-1])
+        report["sources"] = bench_sources(memory)
+
+        print("⏱️ main.main() を計測中 (キャッシュなし → キャッシュあり)...")
+        workdirs.append(_prepare_workdir())
+        os.chdir(workdirs[-1])
+        # 通信・Gemini の回数とキャッシュの効き具合は、main が記録したトレースから取る
+        _, report["main_cold"] = measure(lambda: main.main([]), memory)
+        report["main_cold"]["clients"] = _client_summary()
+        _, report["main_warm"] = measure(lambda: main.main([]), memory)
+        report["main_warm"]["clients"] = _client_summary()
+
+        dates = [d for d in os.listdir(main.ARCHIVE_ROOT) if os.path.isdir(os.path.join(main.ARCHIVE_ROOT, d))]
+        archive_dir = os.path.join(main.ARCHIVE_ROOT, max(dates))
+        report["pages"] = bench_render(archive_dir)
+    finally:
+        os.chdir(cwd)
+        for workdir in workdirs:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def _client_summary():
+    summary = tracing.build_report()
+    return {"http": summary["http"], "llm": summary["llm"]}
+
+def print_report(report):
+    print("\n=== 取得処理ごと ===")
+    print(f"{'stage':<16}{'wall(s)':>10}{'cpu(s)':>10}{'peak(MB)':>10}")
+    rows = list(report["sources"].items()) + [("main (cold)", report["main_cold"]), ("main (warm)", report["main_warm"])]
+    for name, stats in rows:
+        peak = f"{stats['peak_mb']:.1f}" if "peak_mb" in stats else "-"
+        print(f"{name:<16}{stats['wall']:>10.2f}{stats['cpu']:>10.2f}{peak:>10}")
+
+    print("\n=== 通信・Gemini ===")
+    print(f"{'run':<16}{'http':>8}{'304':>8}{'KB':>10}{'gemini':>8}{'cached':>8}{'wait(s)':>10}")
+    for name, key in (("main (cold)", "main_cold"), ("main (warm)", "main_warm")):
+        http, llm = report[key]["clients"]["http"], report[key]["clients"]["llm"]
+        print(f"{name:<16}{http['requests']:>8}{http['revalidated']:>8}{http['bytes'] / 1024:>10.0f}"
+              f"{llm['calls']:>8}{llm['cache_hits']:>8}{llm['wait_seconds']:>10.2f}")
+
+    print("\n=== ページ ===")
+    print(f"{'page':<20}{'render(ms)':>12}{'raw(KB)':>10}{'html(KB)':>10}{'gzip(KB)':>10}")
+    for name, stats in report["pages"].items():
+        print(f"{name:<20}{stats['render_ms']:>12.1f}{stats['raw_kb']:>10.1f}{stats['html_kb']:>10.1f}{stats['gzip_kb']:>10.1f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="サイト生成のベンチマーク (fixtures の記録・再生)")
+    parser.add_argument("command", choices=["record", "synth", "run"])
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="fixtures の置き場")
+    parser.add_argument("--json", help="計測結果をJSONで保存するパス (比較用)")
+    parser.add_argument("--no-memory", action="store_true", help="メモリを計測しない (時間の計測が少し正確になる)")
+    return parser.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    fixture_dir = os.path.abspath(args.fixtures)
+
+    if args.command == "synth":
+        synthesize(fixture_dir)
+        return
+
+    if args.command == "record":
+        install_recorder(fixture_dir)
+        cwd = os.getcwd()
+        workdir = _prepare_workdir()
+        os.chdir(workdir)
+        try:
+            main.main([])
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"✅ fixtures を記録しました: {fixture_dir}")
+        return
+
+    report = run(fixture_dir, memory=not args.no_memory)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\n📝 計測結果を保存しました: {args.json}")
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
@@ -1,9 +1,30 @@
-import google.generativeai as genai
+import ai_client
 import os
-import random
-import requests
 import json
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import fileio
+
+# --- 設定エリア --------------------------
+# 1日に載せるコラムの数
+COLUMN_COUNT = 2
+
+THEMES = [
+    "深海生物", "犬の不思議な行動", "猫の秘密", "最強の昆虫", 
+    "絶滅危惧種", "動物園の人気者", "サバンナの生き物", 
+    "極寒の地の動物", "身近な鳥の意外な生態", "危険な生物",
+    "アマゾンの動物", "砂漠の生き物", "身近な生き物の生態",
+    "水族館の人気者", "絶滅動物", "生き物たちの特殊能力"
+]
+
+# 検索語 → 画像URL の保存先 (GitHub Actions では actions/cache で引き継ぐ)
+IMAGE_CACHE = os.path.join(".cache", "pixabay.json")
+# Pixabay の画像URLは24時間で使えなくなるため、それより古いものは検索し直す
+IMAGE_CACHE_TTL_HOURS = 24
+# ----------------------------------------
 
 def get_animal_image(query):
     api_key = os.environ.get("PIXABAY_API_KEY")
@@ -21,7 +42,7 @@ def get_animal_image(query):
     }
     
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         data = response.json()
         if data["totalHits"] > 0:
             return data["hits"][0]["webformatURL"]
@@ -31,94 +52,116 @@ def get_animal_image(query):
         print(f"Pixabay検索エラー: {e}")
         return None
 
-def generate_single_column(theme_category):
+def load_image_cache():
+    """期限内の {検索語: {"url": 画像URL, "fetched_at": 取得時刻}} を読み込む"""
+    try:
+        with open(IMAGE_CACHE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    limit = time.time() - IMAGE_CACHE_TTL_HOURS * 3600
+    return {q: v for q, v in cache.items() if v.get("fetched_at", 0) >= limit}
+
+def save_image_cache(cache):
+    os.makedirs(os.path.dirname(IMAGE_CACHE), exist_ok=True)
+    fileio.write_json_atomic(IMAGE_CACHE, cache)
+
+def get_animal_images(queries):
+    """複数の検索語の画像URLを {検索語: URL} で返す
+    保存済みの結果は使い回し、それ以外の検索は並行して行う (見つからなかった結果も保存する)"""
+    cache = load_image_cache()
+    misses = [q for q in dict.fromkeys(queries) if q not in cache]
+
+    if misses:
+        lock = threading.Lock()
+
+        def lookup(query):
+            url = get_animal_image(query)
+            with lock:
+                cache[query] = {"url": url, "fetched_at": time.time()}
+
+        with ThreadPoolExecutor(max_workers=len(misses)) as executor:
+            list(executor.map(lookup, misses))
+        try:
+            save_image_cache(cache)
+        except OSError as e:
+            print(f"画像キャッシュ書き込みエラー: {e}")
+
+    print(f"🖼️ 画像検索: {len(misses)}件 / キャッシュ利用 {len(set(queries)) - len(misses)}件")
+    return {q: cache[q]["url"] for q in queries}
+
+# AIに返してもらうJSONの形
+COLUMNS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "theme_category": {"type": "string"},
+            "theme_animal": {"type": "string"},
+            "column_title": {"type": "string"},
+            "column_text": {"type": "string"}
+        },
+        "required": ["theme_category", "theme_animal", "column_title", "column_text"]
+    }
+}
+
+def generate_columns(theme_categories):
+    """カテゴリごとに1本ずつ、生き物が重ならないコラムを1回の呼び出しでまとめて作る"""
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
-        return None
-
-    genai.configure(api_key=api_key)
-    # model = genai.GenerativeModel('gemini-pro')
-    # ★修正箇所: 正式バージョン名 'gemini-1.5-flash-001' を指定
-    model = genai.GenerativeModel(
-        'gemini-2.5-flash',
-        generation_config={"response_mime_type": "application/json"}
-    )
+        return []
 
+    categories = "\n".join(f"- {theme}" for theme in theme_categories)
     prompt = f"""
-    「{theme_category}」というカテゴリから、具体的な生き物を1つ選び、面白くて誰かに話したくなる豆知識コラムを書いてください。
-    出力は以下のJSON形式でお願いします。
+    以下の各カテゴリから、具体的な生き物を1つずつ選び、面白くて誰かに話したくなる豆知識コラムを書いてください。
+    カテゴリごとに1本ずつ、すべて別の生き物にしてください。
     
-    {{
-        "theme_animal": "ここに選んだ生き物の具体的な名前（例: ダイオウイカ）",
-        "column_title": "コラムの見出し（30文字以内）",
-        "column_text": "コラムの本文（子供でも読める親しみやすい口調で、300文字程度）"
-    }}
+    {categories}
+    
+    各コラムには次の内容を入れてください。
+    ・theme_category: 元にしたカテゴリ名（上の一覧のまま）
+    ・theme_animal: 選んだ生き物の具体的な名前（例: ダイオウイカ）
+    ・column_title: コラムの見出し（30文字以内）
+    ・column_text: コラムの本文（子供でも読める親しみやすい口調で、300文字程度）
     """
 
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        if "```json" in text:
-            text = text.replace("```json", "").replace("```", "")
-        elif "```" in text:
-            text = text.replace("```", "")
-            
-        ai_data = json.loads(text)
-        
-        animal_name = ai_data.get("theme_animal", theme_category)
-        title = ai_data.get("column_title", f"{animal_name}の豆知識")
-        body_text = ai_data.get("column_text", "コラム生成失敗")
-
-        print(f"✨ テーマ: {animal_name} の画像を検索します...")
-        image_url = get_animal_image(animal_name)
-
-        return {
-            "headline": title,
-            "text": body_text,
-            "image": image_url,
-            "theme": animal_name
-        }
-        
+        rows = ai_client.generate_json('gemini-2.5-flash', prompt, COLUMNS_SCHEMA, call_site="animal")
     except Exception as e:
         print(f"AI生成エラー: {e}")
-        return None
+        return []
+
+    columns = []
+    seen = set()
+    for row in rows:
+        if not isinstance(row, dict) or not row.get("theme_animal") or not row.get("column_text"):
+            continue
+        # 同じ生き物が重なった場合は最初の1本だけを使う
+        if row["theme_animal"] in seen:
+            continue
+        seen.add(row["theme_animal"])
+        columns.append({
+            "headline": row.get("column_title") or f"{row['theme_animal']}の豆知識",
+            "text": row["column_text"],
+            "image": None,
+            "theme": row["theme_animal"]
+        })
+    return columns[:len(theme_categories)]
 
 def generate_animal_column():
     print("🦁 動物コラムを作成中...")
-    
-    themes = [
-        "深海生物", "犬の不思議な行動", "猫の秘密", "最強の昆虫", 
-        "絶滅危惧種", "動物園の人気者", "サバンナの生き物", 
-        "極寒の地の動物", "身近な鳥の意外な生態", "危険な生物",
-        "アマゾンの動物", "砂漠の生き物", "身近な生き物の生態",
-        "水族館の人気者", "絶滅動物", "生き物たちの特殊能力"
-    ]
-    
-    columns_list = []
-    max_retries = 5
-    attempts = 0
-    
-    while len(columns_list) < 2 and attempts < max_retries:
-        attempts += 1
-        theme = random.choice(themes)
-        
-        if any(c['theme'] == theme for c in columns_list):
-            continue
 
-        print(f"[{attempts}/{max_retries}] テーマ「{theme}」で生成を試みます...")
-        col_data = generate_single_column(theme)
-        
-        if col_data:
-            columns_list.append(col_data)
-            print("✅ 生成成功！")
-        else:
-            print("❌ 生成失敗。")
-            
-        if len(columns_list) < 2:
-            print("⏳ 連続アクセス防止のため20秒待機します...")
-            time.sleep(20)
+    themes = random.sample(THEMES, COLUMN_COUNT)
+    print(f"テーマ「{'」「'.join(themes)}」で生成します...")
+    columns_list = generate_columns(themes)
 
-    if not columns_list:
+    if columns_list:
+        print(f"✅ 生成成功！ ({len(columns_list)}本)")
+        images = get_animal_images([c["theme"] for c in columns_list])
+        for col in columns_list:
+            col["image"] = images.get(col["theme"])
+    else:
+        print("❌ 生成失敗。")
         columns_list.append({
             "headline": "生成に失敗しました",
             "text": "本日はコラムの生成に失敗しました。",
@@ -1,48 +1,132 @@
-import requests
-import time
+import http_client
 import os
 import json
-import google.generativeai as genai
+import hashlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import ai_client
+import fileio
+import tracing
 
-def translate_data(data_dict):
-    """取得したエンタメ情報のあらすじをまとめて日本語翻訳する"""
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return data_dict
+# --- 設定エリア --------------------------
+# 翻訳済みあらすじの保存先 (作品URLとあらすじのハッシュで管理し、翌日以降も再利用する)
+TRANSLATION_STORE = os.path.join("data", "synopsis_ja.json")
+
+# 1回のAI呼び出しで翻訳する作品数
+BATCH_SIZE = 5
+
+# この日数使われなかった翻訳は保存ファイルから削除する
+STORE_KEEP_DAYS = 90
+# ----------------------------------------
+
+def synopsis_key(item):
+    """作品URL + 原文あらすじのハッシュ (あらすじが更新されたら別物として翻訳し直す)"""
+    digest = hashlib.sha1(item.get("synopsis", "").encode('utf-8')).hexdigest()[:12]
+    return f"{item.get('url')}#{digest}"
 
-    print("🤖 AIによる翻訳・要約を実行中...")
-    genai.configure(api_key=api_key)
-    # 動作確認済みの軽量モデル
-    model = genai.GenerativeModel('gemini-2.5-flash')
+def load_translation_store():
+    try:
+        with open(TRANSLATION_STORE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_translation_store(store):
+    """古い翻訳を削除してから保存する"""
+    cutoff = (datetime.date.today() - datetime.timedelta(days=STORE_KEEP_DAYS)).isoformat()
+    store = {k: v for k, v in store.items() if v.get("last_used", "") >= cutoff}
+
+    os.makedirs(os.path.dirname(TRANSLATION_STORE), exist_ok=True)
+    fileio.write_json_atomic(TRANSLATION_STORE, store, indent=1, sort_keys=True)
+
+# AIに返してもらうJSONの形
+SYNOPSIS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "synopsis": {"type": "string"}
+        },
+        "required": ["id", "synopsis"]
+    }
+}
+
+def translate_batch(items):
+    """あらすじだけをまとめて翻訳し、{番号: 翻訳文} を返す (失敗したバッチは空)"""
+    source = [{"id": i, "synopsis": item["synopsis"]} for i, item in enumerate(items)]
 
-    # AIへの指示（データ構造を保ったまま翻訳させる）
     prompt = f"""
-    以下のJSONデータに含まれる全ての作品の `synopsis`（あらすじ）を、
+    以下のJSON配列に含まれる各作品の `synopsis`（あらすじ）を、
     日本語に翻訳し、かつ120文字程度に魅力的に要約してください。
     
     【重要】
-    ・出力は入力と同じJSONフォーマットのみにしてください。
-    ・`synopsis` 以外の値（title, imageなど）は変更しないでください。
-    ・Markdown記法（```jsonなど）は不要です。
+    ・出力は `id` と `synopsis` の2つのキーを持つオブジェクトの配列にしてください。
+    ・`id` は入力と同じ値をそのまま返してください。
     
     入力データ:
-    {json.dumps(data_dict, ensure_ascii=False)}
+    {json.dumps(source, ensure_ascii=False)}
     """
 
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        
-        # JSONクリーニング
-        if "```json" in text:
-            text = text.replace("```json", "").replace("```", "")
-        elif "```" in text:
-            text = text.replace("```", "")
-            
-        return json.loads(text)
+        # 動作確認済みの軽量モデル
+        rows = ai_client.generate_json('gemini-2.5-flash', prompt, SYNOPSIS_SCHEMA, call_site="entertainment")
+
+        translated = {}
+        for row in rows:
+            try:
+                i = int(row["id"])
+            except (TypeError, KeyError, ValueError):
+                continue
+            if 0 <= i < len(items) and row.get("synopsis"):
+                translated[i] = row["synopsis"]
+        return translated
     except Exception as e:
         print(f"翻訳エラー: {e}")
-        return data_dict # 失敗したら元の（英語の）データを返す
+        return {}
+
+def translate_data(data_dict):
+    """取得したエンタメ情報のあらすじを日本語翻訳する
+    翻訳済みのあらすじは保存ファイルから再利用し、新しい作品だけをバッチでAIに送る"""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return data_dict
+
+    store = load_translation_store()
+    today = datetime.date.today().isoformat()
+
+    items = data_dict.get("manga", []) + data_dict.get("anime", [])
+    new_items = []
+    for item in items:
+        entry = store.get(synopsis_key(item))
+        if entry:
+            entry["last_used"] = today
+        else:
+            new_items.append(item)
+
+    print(f"🤖 AIによる翻訳・要約を実行中... (新規 {len(new_items)}件 / 再利用 {len(items) - len(new_items)}件)")
+
+    batches = [new_items[i:i + BATCH_SIZE] for i in range(0, len(new_items), BATCH_SIZE)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            for batch, translated in zip(batches, executor.map(translate_batch, batches)):
+                for i, synopsis_ja in translated.items():
+                    store[synopsis_key(batch[i])] = {"synopsis": synopsis_ja, "last_used": today}
+
+    # 翻訳に失敗した作品は元の（英語の）あらすじのまま残す
+    result = {}
+    for category in ("manga", "anime"):
+        result[category] = []
+        for item in data_dict.get(category, []):
+            entry = store.get(synopsis_key(item))
+            result[category].append({**item, "synopsis": entry["synopsis"]} if entry else item)
+
+    try:
+        save_translation_store(store)
+    except OSError as e:
+        print(f"翻訳データ保存エラー: {e}")
+
+    return result
 
 def get_entertainment_info():
     print("📚 エンタメ情報（漫画・アニメ）を取得中...")
@@ -52,8 +136,8 @@ def get_entertainment_info():
 
     # --- 1. 人気の漫画ランキング (Jikan API) ---
     try:
-        res = requests.get("https://api.jikan.moe/v4/top/manga", 
-                         params={"filter": "bypopularity", "limit": 5}, timeout=10)
+        res = http_client.get("https://api.jikan.moe/v4/top/manga", 
+                         params={"filter": "bypopularity", "limit": 5})
         if res.status_code == 200:
             for item in res.json()['data']:
                 genres = [g['name'] for g in item.get('genres', [])[:3]]
@@ -70,11 +154,11 @@ def get_entertainment_info():
     except Exception as e:
         print(f"漫画APIエラー: {e}")
 
-    time.sleep(2) # 負荷軽減
+    tracing.sleep(2, "Jikan rate limit") # 負荷軽減
 
     # --- 2. 今放送中の人気アニメ (Jikan API) ---
     try:
-        res = requests.get("https://api.jikan.moe/v4/seasons/now", timeout=10)
+        res = http_client.get("https://api.jikan.moe/v4/seasons/now")
         if res.status_code == 200:
             data = res.json()['data']
             sorted_data = sorted(data, key=lambda x: x.get('members', 0), reverse=True)[:5]
@@ -1,4 +1,4 @@
-import requests
+import http_client
 import os
 import json
 
@@ -13,7 +13,7 @@ def get_movies():
     params = {"api_key": api_key, "language": "ja-JP", "region": "JP"}
     
     try:
-        res = requests.get(url, params=params)
+        res = http_client.get(url, params=params)
         data = res.json()
         print("\n--- 🍿 公開予定の映画 ---")
         for movie in data['results'][:3]:
@@ -30,7 +30,7 @@ def get_anime():
     url = "https://api.jikan.moe/v4/seasons/now"
     
     try:
-        res = requests.get(url)
+        res = http_client.get(url)
         data = res.json()
         print("\n--- 📺 放送中の人気アニメ ---")
         # 人気順にソートしてトップ3を表示
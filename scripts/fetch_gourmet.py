@@ -1,5 +1,5 @@
-import requests
-import google.generativeai as genai
+import http_client
+import ai_client
 import os
 import urllib.parse
 import random
@@ -9,7 +9,6 @@ def generate_gourmet_report():
     
     # APIキーの確認
     hp_api_key = os.environ.get("HOTPEPPER_API_KEY")
-    gemini_key = os.environ.get("GEMINI_API_KEY")
     
     if not hp_api_key:
         print("エラー: HOTPEPPER_API_KEYがありません")
@@ -28,17 +27,13 @@ def generate_gourmet_report():
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params)
         data = response.json()
         shops = data['results']['shop']
     except Exception as e:
         print(f"ホットペッパー取得エラー: {e}")
         return
 
-    # 2. Geminiの設定
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-
     print("\n=== ☕ 今日の東京カフェ ===\n")
     
     for shop in shops:
@@ -63,8 +58,8 @@ def generate_gourmet_report():
         このカフェに行きたくなるような、おしゃれな紹介文を1行（50文字以内）で書いてください。
         """
         try:
-            res = model.generate_content(prompt)
-            print(f"AI紹介: {res.text.strip()}")
+            text = ai_client.generate_content('gemini-2.5-flash', prompt, call_site="gourmet")
+            print(f"AI紹介: {text.strip()}")
         except:
             pass
         print("-" * 20)
@@ -1,8 +1,9 @@
-import requests
-import google.generativeai as genai
+import http_client
+import ai_client
+import tracing
 import os
-import json
-import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 
 # --- 設定: 天気を取得したい都市のリスト ---
 CITIES = [
@@ -23,74 +24,111 @@ CITIES = [
     {"name": "ヨハネスブルグ", "lat": -26.2044, "lon": 28.0416},
     {"name": "シンガポール", "lat": 1.3521, "lon": 103.8198}
 ]
+# 1回のリクエストでまとめて問い合わせる都市数 (Open-Meteo はカンマ区切りで複数地点に対応)
+BATCH_SIZE = 50
+# バッチを同時に投げる数の上限
+MAX_WORKERS = 4
+# 失敗時の再試行回数と、指数バックオフの基準時間(秒)
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
 # ----------------------------------------
 
-def get_weather_for_location(lat, lon, name):
+def get_icon(code):
+    if code == 0: return "☀️"
+    if code <= 3: return "☁️"
+    if code <= 48: return "🌫"
+    if code <= 67: return "🌧"
+    if code <= 77: return "☃️"
+    if code <= 82: return "☔"
+    if code <= 99: return "⛈"
+    return "❓"
+
+def parse_weather(data, city):
+    """Open-Meteoの1地点分のデータをテンプレート用の形に変換する"""
+    current = data.get("current", {})
+    daily = data.get("daily", {})
+    
+    return {
+        "name": city["name"],
+        "lat": city["lat"],
+        "lon": city["lon"],
+        "current_temp": current.get("temperature_2m"),
+        "current_icon": get_icon(current.get("weather_code", 0)),
+        "today_max": daily.get("temperature_2m_max", [0])[0],
+        "today_min": daily.get("temperature_2m_min", [0])[0],
+        "rain_prob": daily.get("precipitation_probability_max", [0])[0],
+        "tomorrow_icon": get_icon(daily.get("weather_code", [0,0])[1]),
+        "tomorrow_max": daily.get("temperature_2m_max", [0])[1],
+        "tomorrow_min": daily.get("temperature_2m_min", [0])[1],
+    }
+
+def get_weather_batch(cities):
+    """複数都市の天気を1回のリクエストで取得する (結果は cities と同じ順番、失敗した都市は None)"""
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": ",".join(str(c["lat"]) for c in cities),
+        "longitude": ",".join(str(c["lon"]) for c in cities),
         "daily": "weather_code,temperature_2m_max,temperature_2m_min,precipitation_probability_max",
         "current": "temperature_2m,weather_code",
         "timezone": "auto"
     }
-    
-    # ★修正: 最大5回までリトライする処理を追加
-    max_retries = 5
-    for i in range(max_retries):
+    label = f"{cities[0]['name']} ほか{len(cities)}都市"
+
+    for i in range(MAX_RETRIES):
         try:
-            # タイムアウトを20秒に延長
-            response = requests.get(url, params=params, timeout=20)
+            response = http_client.get(url, params=params, timeout=20)
             
             if response.status_code == 200:
                 data = response.json()
-                
-                def get_icon(code):
-                    if code == 0: return "☀️"
-                    if code <= 3: return "☁️"
-                    if code <= 48: return "🌫"
-                    if code <= 67: return "🌧"
-                    if code <= 77: return "☃️"
-                    if code <= 82: return "☔"
-                    if code <= 99: return "⛈"
-                    return "❓"
-                
-                current = data.get("current", {})
-                daily = data.get("daily", {})
-                
-                return {
-                    "name": name,
-                    "lat": lat,
-                    "lon": lon,
-                    "current_temp": current.get("temperature_2m"),
-                    "current_icon": get_icon(current.get("weather_code", 0)),
-                    "today_max": daily.get("temperature_2m_max", [0])[0],
-                    "today_min": daily.get("temperature_2m_min", [0])[0],
-                    "rain_prob": daily.get("precipitation_probability_max", [0])[0],
-                    "tomorrow_icon": get_icon(daily.get("weather_code", [0,0])[1]),
-                    "tomorrow_max": daily.get("temperature_2m_max", [0])[1],
-                    "tomorrow_min": daily.get("temperature_2m_min", [0])[1],
-                }
+                # 1地点だけのときはリストではなくオブジェクトが返ってくる
+                if isinstance(data, dict):
+                    data = [data]
+
+                results = []
+                for city, city_data in zip(cities, data):
+                    try:
+                        results.append(parse_weather(city_data, city))
+                    except (IndexError, TypeError) as e:
+                        print(f"⚠️ {city['name']}: データ形式エラー ({e})")
+                        results.append(None)
+                return results + [None] * (len(cities) - len(results))
             else:
-                print(f"⚠️ {name}: APIエラー (Status: {response.status_code}) - {i+1}回目の失敗")
+                print(f"⚠️ {label}: APIエラー (Status: {response.status_code}) - {i+1}回目の失敗")
         
         except Exception as e:
-            print(f"⚠️ {name}: 接続エラー ({e}) - {i+1}回目の失敗")
+            print(f"⚠️ {label}: 接続エラー ({e}) - {i+1}回目の失敗")
         
-        # エラーだった場合、少し待ってから再挑戦
-        time.sleep(2)
+        # 指数バックオフ + ジッターで再挑戦 (同時に失敗したバッチが一斉に再送しないようにする)
+        if i < MAX_RETRIES - 1:
+            tracing.sleep(BACKOFF_BASE * (2 ** i) + random.uniform(0, BACKOFF_BASE), "Open-Meteo backoff")
+
+    print(f"❌ {label}: {MAX_RETRIES}回試しましたが取得できませんでした。")
+    return [None] * len(cities)
+
+def get_weather_for_location(lat, lon, name):
+    return get_weather_batch([{"name": name, "lat": lat, "lon": lon}])[0]
 
-    print(f"❌ {name}: 5回試しましたが取得できませんでした。")
-    return None
+# AIに返してもらうJSONの形
+FORTUNE_KEYS = ["rank", "sign", "item", "comment"]
+FORTUNE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "rank": {"type": "integer"},
+            "sign": {"type": "string"},
+            "item": {"type": "string"},
+            "comment": {"type": "string"}
+        },
+        "required": FORTUNE_KEYS
+    }
+}
 
 def get_fortune():
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         return []
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    
     prompt = """
     今日の「12星座占いランキング」をJSON形式で作成してください。
     運勢の良い順（1位〜12位）に並べてください。
@@ -104,14 +142,9 @@ def get_fortune():
     """
     
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        if "```json" in text:
-            text = text.replace("```json", "").replace("```", "")
-        elif "```" in text:
-            text = text.replace("```", "")
-            
-        return json.loads(text)
+        rows = ai_client.generate_json('gemini-2.5-flash', prompt, FORTUNE_SCHEMA, call_site="lifestyle")
+        # 途中で切れた出力を補修した場合は、項目が欠けた星座を除く
+        return [row for row in rows if isinstance(row, dict) and all(k in row for k in FORTUNE_KEYS)]
     except Exception as e:
         print(f"占い生成エラー: {e}")
         return []
@@ -119,22 +152,21 @@ def get_fortune():
 def get_lifestyle_data():
     print(f"☀️ 世界{len(CITIES)}都市の天気を取得開始...")
     
+    batches = [CITIES[i:i + BATCH_SIZE] for i in range(0, len(CITIES), BATCH_SIZE)]
     weather_list = []
-    for i, city in enumerate(CITIES):
-        print(f"[{i+1}/{len(CITIES)}] {city['name']} の天気を取得中...")
-        data = get_weather_for_location(city["lat"], city["lon"], city["name"])
-        if data:
-            weather_list.append(data)
-        
-        # ★修正: 待機時間を0.5秒→1.0秒に延長してAPIに優しくする
-        time.sleep(2.0)
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(batches)) + 1) as executor:
+        # 占いの生成は天気と無関係なので並行して進める
+        fortune_future = executor.submit(get_fortune)
+        for batch_result in executor.map(get_weather_batch, batches):
+            weather_list.extend(data for data in batch_result if data)
+        fortune = fortune_future.result()
 
     print(f"✅ 天気取得完了: {len(weather_list)}/{len(CITIES)} 成功")
 
     return {
         "weather": weather_list[0] if weather_list else None,
         "weather_list": weather_list,
-        "fortune": get_fortune()
+        "fortune": fortune
     }
 
 if __name__ == "__main__":
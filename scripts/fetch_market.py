@@ -1,8 +1,10 @@
-import yfinance as yf
-import google.generativeai as genai
+import ai_client
 import os
+import re
+import json
 import datetime
-import requests
+import http_client
+import fileio
 
 def get_fear_greed_index():
     """CNNのFear & Greed Indexを取得する"""
@@ -13,7 +15,7 @@ def get_fear_greed_index():
     }
     
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_client.get(url, headers=headers)
         if r.status_code == 200:
             data = r.json()
             fg_data = data.get('fear_and_greed', {})
@@ -27,50 +29,163 @@ def get_fear_greed_index():
         
     return None
 
+# 取得する銘柄 (キーはテンプレートのグラフIDに使われる)
+TARGETS = {
+    'nikkei': {'symbol': '^N225', 'name': '日経平均'},
+    'sp500': {'symbol': '^GSPC', 'name': '米国S&P500'},
+    'usdjpy': {'symbol': 'JPY=X', 'name': 'ドル円'},
+    'gold': {'symbol': 'GC=F', 'name': '金先物'},
+    'btc': {'symbol': 'BTC-JPY', 'name': 'ビットコイン'}
+}
+
+# 価格履歴の保存先 (銘柄ごとに1ファイル、日付と終値を列ごとに持つ)
+HISTORY_DIR = os.path.join("data", "market")
+# 保存しておく期間 (日数)。グラフの最長表示期間(1年)より少し長めに残す
+HISTORY_DAYS = 400
+# 直近の足は確定前の値のことがあるため、保存済みでもこの日数分は取り直す
+REFETCH_DAYS = 5
+# グラフで切り替えられる表示期間 (日数)
+CHART_RANGES = {"1M": 31, "3M": 92, "1Y": 366}
+
+def history_path(symbol):
+    safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', symbol)
+    return os.path.join(HISTORY_DIR, f"{safe_name}.json")
+
+def load_history(symbols):
+    """保存済みの終値履歴を読み込む (列: シンボル / 行: 日付)"""
+    import pandas as pd
+    series = {}
+    for symbol in symbols:
+        try:
+            with open(history_path(symbol), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            series[symbol] = pd.Series(stored["close"], index=pd.to_datetime(stored["dates"]), dtype=float)
+        except (OSError, ValueError, KeyError):
+            continue
+    return pd.DataFrame(series)
+
+def save_history(close):
+    """終値履歴を銘柄ごとのファイルに保存する"""
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    for symbol in close.columns:
+        history = close[symbol].dropna()
+        fileio.write_json_atomic(history_path(symbol), {
+            "symbol": symbol,
+            "dates": history.index.strftime('%Y-%m-%d').tolist(),
+            "close": [round(price, 4) for price in history.tolist()]
+        }, separators=(',', ':'))
+
+def update_history(symbols):
+    """保存済みの履歴に、まだ持っていない日の分だけを一括ダウンロードして追加する"""
+    import pandas as pd
+    stored = load_history(symbols)
+    missing = [s for s in symbols if s not in stored.columns or stored[s].dropna().empty]
+    known = [s for s in symbols if s not in missing]
+
+    downloads = []
+    try:
+        if missing:
+            print(f"📥 履歴がない銘柄を1年分取得します: {', '.join(missing)}")
+            downloads.append(download_close_prices(missing, period="1y"))
+        if known:
+            last_date = min(stored[s].dropna().index[-1] for s in known)
+            start = (last_date - pd.Timedelta(days=REFETCH_DAYS)).strftime('%Y-%m-%d')
+            downloads.append(download_close_prices(known, start=start))
+    except Exception as e:
+        # 取得に失敗しても、保存済みの履歴だけでページは作る
+        print(f"株価一括取得エラー: {e}")
+
+    close = stored
+    for fresh in downloads:
+        # 同じ日付は新しく取得した値を優先する
+        close = fresh.combine_first(close)
+    if close.empty:
+        return close
+
+    close = close.sort_index()
+    close = close[close.index >= close.index[-1] - pd.Timedelta(days=HISTORY_DAYS)]
+    try:
+        save_history(close)
+    except OSError as e:
+        print(f"株価履歴の保存エラー: {e}")
+    return close[[s for s in symbols if s in close.columns]]
+
+def download_close_prices(symbols, period="1mo", start=None):
+    """全銘柄の終値を1回の一括ダウンロードで取得する (列: シンボル / 行: 日付)
+    start を指定した場合はその日以降だけを取得する"""
+    import pandas as pd
+    import yfinance as yf
+    span = {"start": start} if start else {"period": period}
+    frame = yf.download(
+        list(symbols), interval="1d", group_by="column",
+        auto_adjust=True, ignore_tz=True, progress=False, threads=True, **span
+    )
+    if frame is None or frame.empty:
+        return pd.DataFrame()
+
+    close = frame["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    return close.dropna(how="all")
+
+def summarize_prices(close):
+    """全銘柄の現在値・前日比・色をまとめて計算する
+    市場ごとに休場日が違うため、銘柄ごとに「最後の有効値」と「その1つ前の有効値」を比べる"""
+    import numpy as np
+    import pandas as pd
+    valid = close.notna()
+    current = close.ffill().iloc[-1]
+    # 最後の有効値より前だけを残して前方補完すると、1つ前の営業日の終値が得られる
+    prev = close.where(valid.cumsum() < valid.sum()).ffill().iloc[-1]
+    diff = (current - prev).fillna(0)
+    return pd.DataFrame({
+        "current": current,
+        "diff": diff,
+        "color": np.where(diff > 0, "red", "blue")
+    })
+
 def generate_market_report():
+    # pandas / yfinance は読み込みが重いため、株価ページを作るときだけ読み込む
+    import pandas as pd
+
     print("📈 市場データと履歴を取得中...")
     
-    targets = {
-        'nikkei': {'symbol': '^N225', 'name': '日経平均'},
-        'sp500': {'symbol': '^GSPC', 'name': '米国S&P500'},
-        'usdjpy': {'symbol': 'JPY=X', 'name': 'ドル円'},
-        'gold': {'symbol': 'GC=F', 'name': '金先物'},
-        'btc': {'symbol': 'BTC-JPY', 'name': 'ビットコイン'}
-    }
-    
     chart_data = {}
     text_data = ""
 
-    for key, item in targets.items():
-        try:
-            ticker = yf.Ticker(item['symbol'])
-            hist = ticker.history(period="1mo")
-            
-            if len(hist) > 0:
-                dates = [d.strftime('%m/%d') for d in hist.index]
-                prices = hist['Close'].tolist()
-                current_price = prices[-1]
-                
-                diff = 0
-                sign = ""
-                if len(prices) >= 2:
-                    prev_price = prices[-2]
-                    diff = current_price - prev_price
-                    sign = "+" if diff > 0 else ""
-
-                chart_data[key] = {
-                    'name': item['name'],
-                    'current': f"{current_price:,.2f}",
-                    'diff': f"{sign}{diff:,.2f}",
-                    'dates': dates,
-                    'prices': prices,
-                    'color': 'red' if diff > 0 else 'blue'
-                }
-                
-                text_data += f"{item['name']}: {current_price:.2f} (前日比 {sign}{diff:.2f})\n"
-                
-        except Exception as e:
-            print(f"エラー ({item['name']}): {e}")
+    symbols = [item['symbol'] for item in TARGETS.values()]
+    close = update_history(symbols)
+    summary = summarize_prices(close) if not close.empty else pd.DataFrame()
+
+    for key, item in TARGETS.items():
+        symbol = item['symbol']
+        if symbol not in summary.index or pd.isna(summary.at[symbol, 'current']):
+            print(f"エラー ({item['name']}): データを取得できませんでした")
+            continue
+
+        history = close[symbol].dropna()
+        last_date = history.index[-1]
+        # ページに埋め込むのは最長の表示期間分だけ
+        history = history[history.index > last_date - pd.Timedelta(days=max(CHART_RANGES.values()))]
+        ranges = {
+            label: int((history.index > last_date - pd.Timedelta(days=days)).sum())
+            for label, days in CHART_RANGES.items()
+        }
+        current_price = float(summary.at[symbol, 'current'])
+        diff = float(summary.at[symbol, 'diff'])
+        sign = "+" if diff > 0 else ""
+
+        chart_data[key] = {
+            'name': item['name'],
+            'current': f"{current_price:,.2f}",
+            'diff': f"{sign}{diff:,.2f}",
+            'dates': history.index.strftime('%m/%d').tolist(),
+            'prices': history.tolist(),
+            'ranges': ranges,  # 表示期間ごとの、末尾から数えたデータ点数
+            'color': summary.at[symbol, 'color']
+        }
+        
+        text_data += f"{item['name']}: {current_price:.2f} (前日比 {sign}{diff:.2f})\n"
 
     # 恐怖指数の取得
     fg_index = get_fear_greed_index()
@@ -81,9 +196,6 @@ def generate_market_report():
     ai_comment = "APIキーがありません"
     
     if api_key:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        
         prompt = f"""
         以下の市場データを元に、投資家向けの「今日の市況概況」を書いてください。
         特に「Fear & Greed Index（恐怖指数）」の値に触れ、
@@ -94,8 +206,7 @@ def generate_market_report():
         {text_data}
         """
         try:
-            response = model.generate_content(prompt)
-            ai_comment = response.text
+            ai_comment = ai_client.generate_content('gemini-2.5-flash-lite', prompt, call_site="market")
         except Exception as e:
             ai_comment = f"AI生成エラー: {e}"
 
@@ -1,7 +1,16 @@
-import requests
-import google.generativeai as genai
+import http_client
+import ai_client
 import os
-import json
+
+# AIに返してもらうJSONの形
+TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "text": {"type": "string"}
+    },
+    "required": ["title", "text"]
+}
 
 def get_nasa_data():
     """NASA APODを取得して日本語化する"""
@@ -11,7 +20,7 @@ def get_nasa_data():
     url = "https://api.nasa.gov/planetary/apod?api_key=DEMO_KEY"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         if response.status_code != 200:
             print(f"NASA API Error: {response.status_code}")
             return None
@@ -31,10 +40,6 @@ def get_nasa_data():
         text_jp = "解説の翻訳に失敗しました。"
         
         if api_key:
-            genai.configure(api_key=api_key)
-            # 動作確認済みの軽量モデルを使用
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
             prompt = f"""
             以下のNASA「今日の宇宙写真」の解説を、日本の一般読者向けにわかりやすく翻訳・要約してください。
             専門用語はなるべく噛み砕いて、知的好奇心をそそる文章にしてください。
@@ -42,23 +47,12 @@ def get_nasa_data():
             Title: {title_en}
             Explanation: {explanation_en}
             
-            出力は以下のJSON形式のみでお願いします:
-            {{
-                "title": "日本語タイトル",
-                "text": "日本語解説文(200文字程度)"
-            }}
+            title には日本語タイトル、text には日本語解説文(200文字程度)を入れてください。
             """
             
             try:
-                ai_res = model.generate_content(prompt)
-                raw_text = ai_res.text
-                # JSONクリーニング
-                if "```json" in raw_text:
-                    raw_text = raw_text.replace("```json", "").replace("```", "")
-                elif "```" in raw_text:
-                    raw_text = raw_text.replace("```", "")
-                
-                ai_data = json.loads(raw_text)
+                # 動作確認済みの軽量モデルを使用
+                ai_data = ai_client.generate_json('gemini-2.5-flash', prompt, TRANSLATION_SCHEMA, call_site="nasa")
                 title_jp = ai_data.get("title", title_en)
                 text_jp = ai_data.get("text", explanation_en)
             except Exception as e:
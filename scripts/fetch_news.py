@@ -1,11 +1,13 @@
-import feedparser
-import google.generativeai as genai
+import ai_client
 import os
 import json
-import requests
+import hashlib
+import datetime
+import http_client
+import fileio
 import urllib.parse
-from wordcloud import WordCloud
-from janome.tokenizer import Tokenizer
+import wordcloud_engine
+import news_dedup
 
 # --- 設定エリア --------------------------
 # 検索したいキーワードをここに追加します
@@ -24,73 +26,80 @@ KEYWORDS = [
 
 # 取得する記事数 (5 -> 10に変更)
 MAX_ARTICLES = 10
+# 重複をまとめる前に読み込む候補の数 (同じニュースが複数の配信元から届くため、多めに取る)
+CANDIDATE_POOL = 50
 
-# ワードクラウド用日本語フォントの設定
+# 要約済み記事の保存先 (記事IDのハッシュで管理し、同じ記事をもう一度要約しない)
+SEEN_STORE = os.path.join("data", "news_seen.json")
+# フィードは直近1日分なので、これより前に要約した記事は保存ファイルから削除する
+SEEN_KEEP_DAYS = 14
+
+# ワードクラウド用日本語フォントの設定 (ダウンロードしたものは .cache/fonts に保存して使い回す)
 FONT_URL = "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/Japanese/NotoSansCJKjp-Regular.otf"
-FONT_PATH = "NotoSansCJKjp-Regular.otf"
+
+# ワードクラウドから除外したい一般的な単語（ストップワード）
+STOP_WORDS = ["こと", "もの", "ため", "よう", "それ", "これ", "さん", "の", "ん", "AI", "活用", "対応", "開発", "発表", "提供", "機能", "サービス", "技術", "利用", "日本", "企業"]
 # ----------------------------------------
 
-def download_font():
-    """ワードクラウド用の日本語フォントをダウンロードする"""
-    if not os.path.exists(FONT_PATH):
-        print("🔤 日本語フォントをダウンロード中...")
-        try:
-            response = requests.get(FONT_URL, timeout=30)
-            with open(FONT_PATH, 'wb') as f:
-                f.write(response.content)
-        except Exception as e:
-            print(f"フォントダウンロードエラー: {e}")
+# AIに返してもらうJSONの形
+NEWS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "catch_copy": {"type": "string"},
+                    "summary": {"type": "string"}
+                },
+                "required": ["id", "catch_copy", "summary"]
+            }
+        },
+        "column": {"type": "string"}
+    },
+    "required": ["items", "column"]
+}
 
 def create_wordcloud(text_list):
     """ニュースのテキストからワードクラウド画像を生成する"""
     print("☁️ ワードクラウドを生成中...")
     
-    # 1. テキストを結合
-    full_text = " ".join(text_list)
-    
-    # 2. 形態素解析で名詞だけ抽出 (Janome使用)
-    t = Tokenizer()
-    tokens = t.tokenize(full_text)
-    words = []
+    # 1. 形態素解析で名詞だけを数える (Janome使用)
+    frequencies = wordcloud_engine.count_nouns(text_list, STOP_WORDS)
     
-    # 除外したい一般的な単語（ストップワード）
-    stop_words = ["こと", "もの", "ため", "よう", "それ", "これ", "さん", "の", "ん", "AI", "活用", "対応", "開発", "発表", "提供", "機能", "サービス", "技術", "利用", "日本", "企業"]
-    
-    for token in tokens:
-        # 名詞のみ抽出し、かつストップワードに含まれないもの
-        if token.part_of_speech.split(',')[0] == '名詞' and token.surface not in stop_words:
-            words.append(token.surface)
-    
-    if not words:
+    if not frequencies:
         print("ワードクラウド生成用の単語が見つかりませんでした。")
         return None
 
-    # 3. スペース区切りの文字列にする
-    text_space = " ".join(words)
-    
-    # 4. フォントの準備
-    download_font()
-    
-    # 5. 画像生成
+    # 2. 画像生成 (出現回数をそのまま渡すので、WordCloud側での再分割は行わない)
     try:
-        wc = WordCloud(
-            font_path=FONT_PATH if os.path.exists(FONT_PATH) else None, # フォント指定
-            width=800, 
-            height=400, 
-            background_color='white',
-            colormap='viridis', # 色使い
-            regexp=r"[\w']+"    # 日本語対応のための正規表現
-        )
-        wc.generate(text_space)
-        
-        # 画像を保存
-        output_filename = "wordcloud.png"
-        wc.to_file(output_filename)
-        return output_filename
+        return wordcloud_engine.render(frequencies, "wordcloud.png", font_url=FONT_URL)
     except Exception as e:
         print(f"ワードクラウド生成エラー: {e}")
         return None
 
+def article_key(entry):
+    """記事のGUID (なければURL) の短いハッシュ"""
+    return hashlib.sha1((entry.get("id") or entry.link).encode('utf-8')).hexdigest()[:16]
+
+def load_seen_store():
+    """{記事キー: {"headline": 見出し, "summary": 要約, "date": 要約した日}} を読み込む"""
+    try:
+        with open(SEEN_STORE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_seen_store(store):
+    """古い記事を削除してから保存する"""
+    cutoff = (datetime.date.today() - datetime.timedelta(days=SEEN_KEEP_DAYS)).isoformat()
+    store = {k: v for k, v in store.items() if v.get("date", "") >= cutoff}
+
+    os.makedirs(os.path.dirname(SEEN_STORE), exist_ok=True)
+    fileio.write_json_atomic(SEEN_STORE, store, indent=1, sort_keys=True)
+
 def get_rss_url():
     """設定したキーワードと期間(1日以内)から検索用URLを作成する"""
     query_string = " OR ".join(KEYWORDS)
@@ -103,10 +112,6 @@ def generate_news():
     if not api_key:
         return {"column": "APIキーエラー", "articles": [], "wordcloud": None}
 
-    genai.configure(api_key=api_key)
-    # 安定して動作する gemini-2.5-flash-lite を指定
-    model = genai.GenerativeModel('gemini-2.5-flash-lite')
-
     rss_url = get_rss_url()
     print(f"📰 Googleニュースから記事を取得中... (キーワード数: {len(KEYWORDS)})")
     
@@ -115,7 +120,8 @@ def generate_news():
     }
     
     try:
-        response = requests.get(rss_url, headers=headers, timeout=10)
+        import feedparser
+        response = http_client.get(rss_url, headers=headers)
         feed = feedparser.parse(response.content)
     except Exception as e:
         return {"column": f"RSS取得エラー: {e}", "articles": [], "wordcloud": None}
@@ -124,46 +130,61 @@ def generate_news():
         print("指定された条件（1日以内）で記事が見つかりませんでした。")
         return {"column": "直近24時間での関連ニュースは見つかりませんでした。", "articles": [], "wordcloud": None}
 
-    articles = feed.entries[:MAX_ARTICLES]
+    # 同じニュースの転載・類似記事をまとめ、別々のニュースだけをAIに渡す
+    articles = news_dedup.pick_distinct(feed.entries[:CANDIDATE_POOL], MAX_ARTICLES)
     
+    # 前回までに要約した記事は保存した見出し・要約を使い、新しい記事だけをAIに要約させる
+    seen = load_seen_store()
+    new_ids = [i for i, entry in enumerate(articles) if article_key(entry) not in seen]
+    print(f"🤖 AIによる要約を実行中... (新規 {len(new_ids)}件 / 再利用 {len(articles) - len(new_ids)}件)")
+
     # AIへの指示
     prompt = "以下のニュース記事リストを読み、Webサイト掲載用のデータをJSON形式で作成してください。\n"
     prompt += "【要件】\n"
-    prompt += "1. `items`: 各記事について『catch_copy(30文字以内の見出し)』と『summary(100文字程度の要約)』を作成。\n"
-    prompt += "2. `column`: 記事全体から読み取れる『今日のAI・テック業界の動き』を300文字程度のコラムとして作成。\n\n"
-    prompt += "【記事リスト】\n"
-    
-    for i, entry in enumerate(articles):
-        prompt += f"ID:{i} タイトル:{entry.title}\n"
+    prompt += "1. `items`: 【要約する記事】の各記事について、記事のIDを `id` に入れ、『catch_copy(30文字以内の見出し)』と『summary(100文字程度の要約)』を作成。\n"
+    prompt += "2. `column`: 【要約する記事】と【その他の記事】の全体から読み取れる『今日のAI・テック業界の動き』を300文字程度のコラムとして作成。\n\n"
+    prompt += "【要約する記事】\n"
+    for i in new_ids:
+        prompt += f"ID:{i} タイトル:{articles[i].title}\n"
+    if not new_ids:
+        prompt += "(なし。`items` は空の配列にしてください)\n"
+
+    if len(new_ids) < len(articles):
+        prompt += "\n【その他の記事】\n"
+        for i, entry in enumerate(articles):
+            if i not in new_ids:
+                prompt += f"タイトル:{entry.title}\n"
 
     ai_data = {}
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-
-        # JSON整形処理
-        if "```json" in text:
-            text = text.replace("```json", "").replace("```", "")
-        elif "```" in text:
-            text = text.replace("```", "")
-        
-        ai_data = json.loads(text)
-        
+        # 安定して動作する gemini-2.5-flash-lite を指定
+        ai_data = ai_client.generate_json('gemini-2.5-flash-lite', prompt, NEWS_SCHEMA, call_site="news")
     except Exception as e:
         print(f"AI生成エラー: {e}")
         ai_data = {"column": f"AI生成エラー: {e}", "items": []}
 
     final_articles = []
-    ai_items = ai_data.get("items", [])
+    ai_items = {}
+    for row in ai_data.get("items", []):
+        if isinstance(row, dict) and isinstance(row.get("id"), int):
+            ai_items[row["id"]] = row
     
     # ワードクラウド生成用のテキストリスト
     text_for_wordcloud = []
     
+    today = datetime.date.today().isoformat()
     for i, entry in enumerate(articles):
-        ai_item = ai_items[i] if i < len(ai_items) else {"catch_copy": entry.title, "summary": "要約生成失敗"}
-        
-        headline = ai_item.get("catch_copy", entry.title)
-        summary = ai_item.get("summary", "")
+        key = article_key(entry)
+        if key in seen:
+            headline = seen[key]["headline"]
+            summary = seen[key]["summary"]
+        elif i in ai_items and ai_items[i].get("summary"):
+            headline = ai_items[i].get("catch_copy") or entry.title
+            summary = ai_items[i]["summary"]
+            seen[key] = {"headline": headline, "summary": summary, "date": today}
+        else:
+            headline = entry.title
+            summary = "要約生成失敗"
 
         final_articles.append({
             "title": entry.title,
@@ -178,6 +199,11 @@ def generate_news():
         text_for_wordcloud.append(headline)
         text_for_wordcloud.append(summary)
 
+    try:
+        save_seen_store(seen)
+    except OSError as e:
+        print(f"要約済み記事の保存エラー: {e}")
+
     # ワードクラウド画像の生成を実行
     wc_image_file = create_wordcloud(text_for_wordcloud)
 
@@ -0,0 +1,24 @@
+import os
+import json
+import tempfile
+
+# ファイルの書き込みをまとめたもの
+# 同じディレクトリの一時ファイルに書いてから置き換えるので、途中で止まっても、
+# 複数のスレッド・プロセスが同時に書いても、書きかけのファイルが残ることはない
+
+def write_bytes_atomic(path, data):
+    """一時ファイルに書いてから置き換える"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def write_json_atomic(path, data, **options):
+    """JSONにして write_bytes_atomic で書き込む (options は json.dumps にそのまま渡す)"""
+    write_bytes_atomic(path, json.dumps(data, ensure_ascii=False, **options).encode('utf-8'))
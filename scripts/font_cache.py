@@ -0,0 +1,136 @@
+import os
+import hashlib
+import logging
+import http_client
+
+# --- 設定エリア --------------------------
+# ダウンロードしたフォントとサブセットの置き場 (GitHub Actions では actions/cache で引き継ぐ)
+CACHE_DIR = os.path.join(".cache", "fonts")
+# 残しておくサブセットの数 (フォントを差し替えた直後に前のものも残しておく)
+SUBSET_KEEP = 2
+# ----------------------------------------
+
+def _subset_charset():
+    """サブセットに入れる文字: ASCII と JIS X 0208 の全文字 (かな・記号・第1/第2水準漢字)
+    ニュースの見出しに出てくる文字はほぼこれで足りる"""
+    chars = {chr(c) for c in range(0x20, 0x7f)}
+    for row in range(0xA1, 0xFF):
+        for cell in range(0xA1, 0xFF):
+            try:
+                chars.add(bytes([row, cell]).decode("euc_jp"))
+            except UnicodeDecodeError:
+                pass
+    return "".join(sorted(chars))
+
+SUBSET_CHARS = _subset_charset()
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_font(url, expected_sha256=None):
+    """フォントをキャッシュから返す。なければダウンロードして保存する (失敗時は None)
+
+    キャッシュはURLのハッシュ名で保存し、内容のハッシュを横に記録しておく。
+    expected_sha256 を指定した場合は、内容が一致しないフォントは使わない。
+    """
+    name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    ext = os.path.splitext(url)[1] or ".otf"
+    font_path = os.path.join(CACHE_DIR, f"{name}{ext}")
+    hash_path = f"{font_path}.sha256"
+
+    if os.path.exists(font_path) and os.path.exists(hash_path):
+        with open(hash_path, 'r', encoding='utf-8') as f:
+            content_hash = f.read().strip()
+        if expected_sha256 is None or content_hash == expected_sha256:
+            return font_path
+
+    print("🔤 日本語フォントをダウンロード中...")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{font_path}.tmp"
+    try:
+        with http_client.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+
+        content_hash = _sha256_file(tmp_path)
+        if expected_sha256 and content_hash != expected_sha256:
+            print(f"フォントのハッシュが一致しません: {content_hash}")
+            os.remove(tmp_path)
+            return None
+
+        os.replace(tmp_path, font_path)
+        with open(hash_path, 'w', encoding='utf-8') as f:
+            f.write(content_hash)
+        return font_path
+    except Exception as e:
+        print(f"フォントダウンロードエラー: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def _prune_subsets():
+    try:
+        paths = [os.path.join(CACHE_DIR, n) for n in os.listdir(CACHE_DIR) if n.startswith("subset-")]
+    except OSError:
+        return
+    for path in sorted(paths, key=os.path.getmtime, reverse=True)[SUBSET_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def subset_font(font_path, text):
+    """SUBSET_CHARS だけを持つ小さなフォントのパスを返す
+
+    サブセットはフォントごとに一度だけ作り、フォントの内容のハッシュで使い回す
+    (CJKフォント全体の読み込みは重いため、毎回の文字に合わせて作り直すことはしない)。
+    text に SUBSET_CHARS にない文字がある場合、fontTools がない場合、作成に失敗した場合は
+    元のフォントをそのまま返す"""
+    missing = set(text) - set(SUBSET_CHARS)
+    if missing:
+        print(f"🔤 サブセットにない文字があるため元のフォントを使います: {''.join(sorted(missing))[:20]}")
+        return font_path
+    try:
+        from fontTools import subset
+    except ImportError:
+        return font_path
+    # 使わないテーブルを捨てたときの警告は出さない
+    logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+
+    hash_path = f"{font_path}.sha256"
+    try:
+        with open(hash_path, 'r', encoding='utf-8') as f:
+            font_hash = f.read().strip()
+    except OSError:
+        font_hash = _sha256_file(font_path)
+
+    key = hashlib.sha256(f"{font_hash}:{SUBSET_CHARS}".encode('utf-8')).hexdigest()[:16]
+    subset_path = os.path.join(CACHE_DIR, f"subset-{key}{os.path.splitext(font_path)[1]}")
+    if os.path.exists(subset_path):
+        os.utime(subset_path)
+        return subset_path
+
+    print("🔤 フォントのサブセットを作成中 (フォントごとに初回のみ)...")
+    try:
+        options = subset.Options()
+        options.notdef_outline = True
+        font = subset.load_font(font_path, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=SUBSET_CHARS)
+        subsetter.subset(font)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{subset_path}.tmp"
+        subset.save_font(font, tmp_path, options)
+        os.replace(tmp_path, subset_path)
+        _prune_subsets()
+        return subset_path
+    except Exception as e:
+        print(f"フォントのサブセット作成エラー: {e}")
+        return font_path
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import fileio
+import tracing
+
+# --- 設定エリア --------------------------
+# タイムアウト (秒)。個別に指定しなかったリクエストはすべてこの値を使う
+DEFAULT_TIMEOUT = 10
+# ホストごとに保持しておく接続数 (並列で取得するソースの数に合わせる)
+POOL_SIZE = 8
+# 再検証用に保存したレスポンスの置き場 (GitHub Actions では actions/cache で引き継ぐ)
+CACHE_DIR = os.path.join(".cache", "http")
+# これより古い保存済みレスポンスは削除する
+CACHE_MAX_AGE_DAYS = 7
+# "0" にすると再検証を使わず、毎回すべて取得する
+CACHE_ENABLED = os.environ.get("HTTP_CACHE", "1") != "0"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; DailyPortal/1.0)"
+}
+# ----------------------------------------
+
+# ホストごとに1つの Session を使い回し、keep-alive で接続を再利用する
+_sessions = {}
+_sessions_lock = threading.Lock()
+_pruned = False
+
+def get_session(url):
+    """URLのホスト用の Session を返す (なければ作る)"""
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(host, adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            _sessions[host] = session
+        return session
+
+def _cache_paths(url):
+    # キーにはURL全体 (クエリ込み) のハッシュを使い、APIキーなどはファイルに残さない
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json"), os.path.join(CACHE_DIR, f"{key}.body")
+
+def _load_cached(url):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+def _store(url, response):
+    """ETag / Last-Modified のあるレスポンスだけを、次回の再検証用に保存する"""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not (etag or last_modified):
+        return
+
+    meta = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": response.headers.get("Content-Type"),
+        "stored_at": time.time()
+    }
+    meta_path, body_path = _cache_paths(url)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # 本文を先に書き、メタ情報が本文より新しくなることがないようにする
+        fileio.write_bytes_atomic(body_path, response.content)
+        fileio.write_json_atomic(meta_path, meta)
+    except OSError as e:
+        print(f"HTTPキャッシュ書き込みエラー: {e}")
+    _prune()
+
+def _prune():
+    """古い保存済みレスポンスを削除する (1回の実行で1度だけ)"""
+    global _pruned
+    if _pruned:
+        return
+    _pruned = True
+    limit = time.time() - CACHE_MAX_AGE_DAYS * 86400
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _from_cache(response, meta, body):
+    """304 を受け取ったとき、保存しておいた本文で 200 のレスポンスを組み立てる"""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached.reason = "OK (revalidated)"
+    cached._content = body
+    cached.url = response.url
+    cached.request = response.request
+    cached.headers = CaseInsensitiveDict(response.headers)
+    if meta.get("content_type"):
+        cached.headers["Content-Type"] = meta["content_type"]
+    cached.encoding = requests.utils.get_encoding_from_headers(cached.headers)
+    cached.from_cache = True
+    return cached
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, revalidate=True, stream=False):
+    """GET リクエストを送る (requests.Response を返す)
+
+    revalidate=True のときは、前回のレスポンスの ETag / Last-Modified を付けて問い合わせ、
+    304 (変更なし) なら保存しておいた本文を 200 として返す (response.from_cache が True になる)。
+    """
+    parts = urlsplit(url)
+    # クエリには APIキーが入ることがあるため、記録するのはホストとパスだけ
+    with tracing.span(f"GET {parts.netloc}{parts.path}", "http") as attrs:
+        response = _get(url, params, headers, timeout, revalidate, stream)
+        attrs["status"] = response.status_code
+        attrs["revalidated"] = response.from_cache
+        if stream:
+            attrs["bytes"] = int(response.headers.get("Content-Length") or 0)
+        elif not response.from_cache:
+            attrs["bytes"] = len(response.content)
+        return response
+
+def _get(url, params, headers, timeout, revalidate, stream):
+    session = get_session(url)
+    request_url = requests.Request("GET", url, params=params).prepare().url
+    revalidate = revalidate and CACHE_ENABLED and not stream
+
+    request_headers = dict(headers or {})
+    meta = body = None
+    if revalidate:
+        meta, body = _load_cached(request_url)
+        if meta:
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = session.get(request_url, headers=request_headers, timeout=timeout, stream=stream)
+    response.from_cache = False
+
+    if not revalidate:
+        return response
+    if response.status_code == 304 and meta:
+        # 使ったことを mtime に残し、よく使うものが古い扱いで消されないようにする
+        for path in _cache_paths(request_url):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return _from_cache(response, meta, body)
+    if response.status_code == 200:
+        _store(request_url, response)
+    return response
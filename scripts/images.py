@@ -0,0 +1,191 @@
+import io
+import os
+import json
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import assets
+import fileio
+import http_client
+import tracing
+
+# --- 設定エリア --------------------------
+# 作る縮小版の幅 (元画像より大きいものは作らない)
+WIDTHS = [320, 640, 1280]
+WEBP_QUALITY = 80
+# 縮小版の置き場 (assets/img/ に内容ハッシュ名で保存し、サイトと一緒に公開する)
+ASSET_SUBDIR = "img"
+
+# ダウンロードした元画像の置き場 (内容ハッシュ名で保存。GitHub Actions では actions/cache で引き継ぐ)
+CACHE_DIR = os.path.join(".cache", "images")
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+# これより長く使われていないURL・元画像は削除する
+KEEP_DAYS = 30
+
+MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024
+MAX_WORKERS = 8
+# ----------------------------------------
+
+# 設定が変わったら縮小版を作り直すための印
+VARIANT_SETTINGS = f"{WIDTHS}:{WEBP_QUALITY}"
+
+def load_index():
+    """{"urls": {URL: {"sha256": 内容のハッシュ, "last_used": 日付}}, "variants": {ハッシュ: 縮小版の情報}} を読み込む"""
+    try:
+        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    index.setdefault("urls", {})
+    index.setdefault("variants", {})
+    return index
+
+def save_index(index):
+    """使われなくなったURL・縮小版の情報・元画像を削除してから保存する"""
+    cutoff = (datetime.date.today() - datetime.timedelta(days=KEEP_DAYS)).isoformat()
+    index["urls"] = {u: v for u, v in index["urls"].items() if v.get("last_used", "") >= cutoff}
+    used = {v["sha256"] for v in index["urls"].values()}
+    index["variants"] = {h: v for h, v in index["variants"].items() if h in used}
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for name in os.listdir(CACHE_DIR):
+        if len(name) == 64 and name not in used:
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+    fileio.write_json_atomic(INDEX_FILE, index)
+
+def _variants_exist(info):
+    return info and info.get("settings") == VARIANT_SETTINGS and all(
+        os.path.exists(v["path"]) for v in info["srcset"]
+    )
+
+def download(url):
+    """画像をダウンロードし、内容のハッシュ名で保存してハッシュを返す (失敗時は None)"""
+    try:
+        with http_client.get(url, timeout=20, stream=True) as response:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                data.extend(chunk)
+                if len(data) > MAX_DOWNLOAD_BYTES:
+                    print(f"画像が大きすぎるため使いません: {url}")
+                    return None
+    except Exception as e:
+        print(f"画像ダウンロードエラー ({url}): {e}")
+        return None
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(CACHE_DIR, digest)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fileio.write_bytes_atomic(path, bytes(data))
+    return digest
+
+def make_variants(digest):
+    """元画像から幅ごとの WebP を作って assets/img/ に保存し、縮小版の情報を返す"""
+    from PIL import Image, ImageOps
+
+    with Image.open(os.path.join(CACHE_DIR, digest)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    width, height = image.size
+    # 元画像が一番小さい幅より小さい場合は、元の大きさのまま WebP にする
+    widths = [w for w in WIDTHS if w < width]
+    if min(width, WIDTHS[-1]) not in widths:
+        widths.append(min(width, WIDTHS[-1]))
+
+    srcset = []
+    for w in widths:
+        resized = image if w == width else image.resize((w, round(height * w / width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=6)
+        srcset.append({"path": assets.store_bytes(buffer.getvalue(), ".webp", subdir=ASSET_SUBDIR), "width": w})
+
+    return {
+        "src": srcset[-1]["path"],
+        "srcset": srcset,
+        "width": widths[-1],
+        "height": round(height * widths[-1] / width),
+        "settings": VARIANT_SETTINGS
+    }
+
+def process(urls):
+    """URLごとに縮小版を用意し、{URL: 縮小版の情報 (失敗時は None)} を返す
+    一度処理したURLはダウンロードも縮小もせずに使い回す"""
+    index = load_index()
+    lock = threading.Lock()
+    today = datetime.date.today().isoformat()
+    counts = {"downloaded": 0, "resized": 0}
+
+    def handle(url):
+        with lock:
+            entry = index["urls"].get(url)
+        digest = entry["sha256"] if entry else None
+
+        if digest is None or not os.path.exists(os.path.join(CACHE_DIR, digest)):
+            with lock:
+                info = index["variants"].get(digest) if digest else None
+            # 元画像が消えていても、縮小版が揃っていればダウンロードし直さない
+            if not _variants_exist(info):
+                digest = download(url)
+                if digest is None:
+                    return None
+                with lock:
+                    counts["downloaded"] += 1
+
+        with lock:
+            index["urls"][url] = {"sha256": digest, "last_used": today}
+            info = index["variants"].get(digest)
+        if _variants_exist(info):
+            return info
+
+        try:
+            with tracing.span("image resize", "cpu"):
+                info = make_variants(digest)
+        except Exception as e:
+            print(f"画像の縮小エラー ({url}): {e}")
+            return None
+        with lock:
+            index["variants"][digest] = info
+            counts["resized"] += 1
+        return info
+
+    unique = list(dict.fromkeys(u for u in urls if u))
+    results = {}
+    if unique:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(unique))) as executor:
+            results = dict(zip(unique, executor.map(handle, unique)))
+        try:
+            save_index(index)
+        except OSError as e:
+            print(f"画像キャッシュ書き込みエラー: {e}")
+
+    print(f"🖼️ 画像: {len(unique)}枚 (ダウンロード {counts['downloaded']}枚 / 縮小版作成 {counts['resized']}枚)")
+    return results
+
+def _image_refs(results):
+    """取得結果の中の画像URLを持つ項目を (項目, URLのキー) で列挙する"""
+    animal = results.get("animal") or {}
+    for col in animal.get("columns", []):
+        yield col, "image"
+
+    nasa = results.get("nasa")
+    if nasa and nasa.get("media_type") == "image":
+        yield nasa, "url"
+
+    entertainment = results.get("entertainment") or {}
+    for item in entertainment.get("manga", []) + entertainment.get("anime", []):
+        yield item, "image"
+
+def localize(results):
+    """取得結果の画像に縮小版の情報 (image_variants) を付け加える
+    縮小版を作れなかった画像は、テンプレートで元のURLをそのまま使う"""
+    refs = list(_image_refs(results))
+    variants = process([item.get(key) for item, key in refs])
+    for item, key in refs:
+        item["image_variants"] = variants.get(item.get(key))
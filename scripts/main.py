@@ -1,24 +1,225 @@
 import os
-import shutil
-from jinja2 import Environment, FileSystemLoader
+import sys
+import time  # 時間計測用
+import argparse
 import datetime
-import glob
-import time  # 時間制御用
+import queue
+import importlib
+import threading
 
-# 各スクリプトをインポート
-import fetch_news
-import fetch_market
-import fetch_animal
-import fetch_entertainment
-import fetch_lifestyle
-import fetch_nasa
+_startup = time.perf_counter()
+
+# 共通モジュールをインポート (各ソースのモジュールは、実行するときに読み込む)
+import ai_client
+import assets
+import fileio
+import images
+import render
+import snapshot
+import tracing
 
 # 出力先の基本設定
 OUTPUT_DIR = "." 
 ARCHIVE_ROOT = "archives"
+# 過去記事の一覧 (各ページはこれを読み込んでナビゲーションを表示する)
+ARCHIVE_MANIFEST = os.path.join(ARCHIVE_ROOT, "index.json")
+# 各日のアーカイブに残すビルドレポート (処理ごとの所要時間・通信量・キャッシュ利用率)
+BUILD_REPORT_FILE = "build.json"
+
+# 各データソースの定義
+# section: --sections で指定する名前 (ページ単位) / module, func: 実行時に読み込むモジュールと関数
+# deps: 先に完了している必要があるソース名 / timeout: 1ソースあたりの待ち時間の上限(秒)
+# usable: Geminiの予算超過で生成を省略したとき、取得結果がまだ載せられるかを判定する関数
+#         (判定がないか True なら今日の結果をそのまま使い、False なら前回のスナップショットで代用する)
+SOURCES = [
+    {"name": "news", "section": "news", "label": "📰 ニュース", "module": "fetch_news", "func": "generate_news",
+     "deps": (), "timeout": 300, "fallback": {"column": "取得エラー", "articles": [], "wordcloud": None},
+     "usable": lambda data: bool(data.get("articles"))},
+    {"name": "market", "section": "market", "label": "📈 株価", "module": "fetch_market", "func": "generate_market_report",
+     "deps": (), "timeout": 180, "fallback": {"summary": "取得エラー", "data": {}}},
+    {"name": "animal", "section": "animal", "label": "🦁 動物", "module": "fetch_animal", "func": "generate_animal_column",
+     "deps": (), "timeout": 300, "fallback": {"columns": []},
+     "usable": lambda data: any(col.get("theme") != "エラー" for col in data.get("columns", []))},
+    {"name": "nasa", "section": "animal", "label": "🚀 NASA", "module": "fetch_nasa", "func": "get_nasa_data",
+     "deps": (), "timeout": 120, "fallback": None},
+    {"name": "entertainment", "section": "entertainment", "label": "📚 エンタメ", "module": "fetch_entertainment", "func": "get_entertainment_info",
+     "deps": (), "timeout": 180, "fallback": {"manga": [], "anime": []},
+     "usable": lambda data: bool(data.get("manga") or data.get("anime"))},
+    {"name": "lifestyle", "section": "lifestyle", "label": "☀️ 生活情報", "module": "fetch_lifestyle", "func": "get_lifestyle_data",
+     "deps": (), "timeout": 300, "fallback": {"weather": None, "fortune": [], "weather_list": []}},
+]
+
+SECTIONS = list(dict.fromkeys(source["section"] for source in SOURCES))
+
+def _run_source(source):
+    """1つのソースを実行し、(結果, 所要時間, モジュール読み込み時間) を返す"""
+    start = time.perf_counter()
+    import_seconds = 0.0
+    with tracing.span(f"fetch {source['name']}", "fetch") as attrs:
+        try:
+            with tracing.span(f"import {source['module']}", "import"):
+                module = importlib.import_module(source["module"])
+            import_seconds = time.perf_counter() - start
+            return getattr(module, source["func"])(), time.perf_counter() - start, import_seconds
+        except Exception as e:
+            attrs["error"] = str(e)
+            print(f"{source['label']}取得エラー: {e}")
+            return None, time.perf_counter() - start, import_seconds
+
+def _start_source(source, finished):
+    """ソースをデーモンスレッドで実行し、終わったら (名前, 結果) を finished に入れる
+    タイムアウトしたスレッドは途中で止められないが、デーモンなのでプロセスの終了は待たせない"""
+    def target():
+        finished.put((source["name"], _run_source(source)))
+    threading.Thread(target=target, name=f"source-{source['name']}", daemon=True).start()
+
+def run_sources(sources):
+    """依存関係を守りつつ、独立したソースを同時に取得する
+    失敗・タイムアウトしたソースは fallback のデータに置き換え、他のソースには影響させない
+
+    タイムアウトしたソースの結果は、あとで届いても捨てる。スレッド自体はプロセスが終わるまで
+    動き続けるので、その間に data/ や .cache/ のストアを更新することはある
+    (どれもアトミックに書き込むため壊れることはなく、次回の実行がそれを使うだけ)"""
+    results = {}
+    timings = {}
+    pending = list(sources)
+    running = {}  # ソース名 -> (source, 締め切り時刻)
+    finished = queue.Queue()
+    build_start = time.perf_counter()
+
+    while pending or running:
+        # 依存先がすべて終わったソースを投入する
+        for source in list(pending):
+            if all(dep in results for dep in source["deps"]):
+                pending.remove(source)
+                print(f"{source['label']}データ取得開始...")
+                _start_source(source, finished)
+                running[source["name"]] = (source, time.perf_counter() + source["timeout"])
+
+        if not running:
+            # 依存先が存在しないなど、これ以上進めないソースは諦める
+            for source in pending:
+                print(f"⚠️ {source['label']}: 依存関係を解決できないためスキップします")
+                results[source["name"]] = source["fallback"]
+                timings[source["name"]] = {"seconds": 0.0, "status": "skipped"}
+            break
+
+        next_deadline = min(deadline for _, deadline in running.values())
+        try:
+            name, (data, elapsed, import_seconds) = finished.get(timeout=max(0, next_deadline - time.perf_counter()))
+        except queue.Empty:
+            name = None
+
+        # タイムアウト済みのソースの結果は running にないので、ここで捨てられる
+        if name in running:
+            source, _ = running.pop(name)
+            status = "ok" if data is not None else "error"
+            results[name] = data if data is not None else source["fallback"]
+            timings[name] = {
+                "seconds": round(elapsed, 2),
+                "import_seconds": round(import_seconds, 2),
+                "status": status
+            }
+            mark = "✅" if status == "ok" else "⚠️"
+            print(f"{mark} {source['label']}: {elapsed:.1f}秒 (うち読み込み {import_seconds:.1f}秒 / {status})")
+
+        # 締め切りを過ぎたソースは待たずに代替データで進める
+        now = time.perf_counter()
+        for name, (source, deadline) in list(running.items()):
+            if now >= deadline:
+                running.pop(name)
+                print(f"⏰ {source['label']}: {source['timeout']}秒でタイムアウトしました")
+                results[name] = source["fallback"]
+                timings[name] = {"seconds": float(source["timeout"]), "status": "timeout"}
+
+    total = time.perf_counter() - build_start
+    serial = sum(t["seconds"] for t in timings.values())
+    print(f"⏱️ データ取得完了: {total:.1f}秒 (直列実行なら {serial:.1f}秒)")
+
+    ai_stats = ai_client.get_stats()
+    print(f"🤖 Gemini呼び出し: {ai_stats['calls']}回 / キャッシュ利用: {ai_stats['cache_hits']}回 "
+          f"(待機 {ai_stats['wait_seconds']:.1f}秒 / 応答 {ai_stats['call_seconds']:.1f}秒)")
+    print(format_llm_usage(ai_client.get_usage()))
+
+    # 予算超過で生成を省略したソースも、載せられる結果があればそのまま使う
+    # (要約・翻訳・占いなどはその部分を省いた形になる)。何も残らなかったものだけ前回のデータで代用させる
+    # 省略した日のデータは "partial" として残し、後日の代用には使わない
+    by_name = {source["name"]: source for source in sources}
+    for name in ai_client.refused_call_sites():
+        timing = timings.get(name)
+        if not timing or timing["status"] != "ok":
+            continue
+        timing["budget_refused"] = True
+        usable = by_name[name].get("usable")
+        timing["status"] = "budget" if usable and not usable(results[name]) else "partial"
+    return results, timings
+
+def format_llm_usage(usage):
+    """呼び出し元・モデルごとの Gemini 使用量を表にする"""
+    budget = usage["budget"]
+    lines = [f"💰 Gemini予算: {budget['used_tokens']:,}/{budget['tokens']:,}トークン "
+             f"/ {budget['used_seconds']:.1f}/{budget['seconds']:.0f}秒"]
+    for entry in usage["by_call_site"]:
+        lines.append(f"   {entry['call_site']:<14} {entry['model']:<22} {entry['calls']}回 (キャッシュ {entry['cache_hits']}回) "
+                     f"入力 {entry['prompt_tokens']:,} / 出力 {entry['output_tokens']:,}トークン / {entry['seconds']:.1f}秒")
+    if usage["refused"]:
+        lines.append(f"💸 予算超過で省略: {', '.join(usage['refused'])}")
+    return "\n".join(lines)
+
+def write_archive_manifest(archive_dates):
+    """アーカイブ日付の一覧を1つのJSONにまとめる
+    一覧をページごとに埋め込むと、日が経つほど全ページが大きくなってしまうため"""
+    os.makedirs(ARCHIVE_ROOT, exist_ok=True)
+    fileio.write_json_atomic(ARCHIVE_MANIFEST, {"dates": archive_dates}, separators=(',', ':'))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Daily Portal のページを生成します")
+    parser.add_argument(
+        "--rerender-archives", action="store_true",
+        help="データ取得は行わず、保存済みのスナップショットから全アーカイブを描画し直す"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="--rerender-archives で使うプロセス数 (省略時はCPU数)"
+    )
+    parser.add_argument(
+        "--precompress", action="store_true", default=os.environ.get("PRECOMPRESS") == "1",
+        help="各ページの .gz / .br も書き出す (事前圧縮ファイルを配信できるホスト向け)"
+    )
+    parser.add_argument(
+        "--trace", default=os.environ.get("TRACE_FILE"),
+        help="処理の区間を Chrome の Trace Event 形式で書き出すパス (chrome://tracing や Perfetto で開ける)"
+    )
+    parser.add_argument(
+        "--sections",
+        help=f"生成するセクションをカンマ区切りで指定 (省略時はすべて): {','.join(SECTIONS)}"
+    )
+    args = parser.parse_args(argv)
+
+    if args.sections is not None:
+        sections = [name.strip() for name in args.sections.split(",") if name.strip()]
+        if not sections:
+            parser.error(f"--sections にセクションが指定されていません (指定できるのは {', '.join(SECTIONS)})")
+        unknown = [name for name in sections if name not in SECTIONS]
+        if unknown:
+            parser.error(f"不明なセクション: {', '.join(unknown)} (指定できるのは {', '.join(SECTIONS)})")
+        args.sections = sections
+    else:
+        args.sections = SECTIONS
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.rerender_archives:
+        print("🔁 アーカイブの再描画を開始します...")
+        render.rerender_archives(ARCHIVE_ROOT, 'templates', output_dir=OUTPUT_DIR,
+                                workers=args.workers, precompress=args.precompress)
+        return
 
-def main():
     print("🚀 サイト生成プロセスを開始します...")
+    tracing.reset()
+    print(f"📦 起動時の読み込み: {time.perf_counter() - _startup:.2f}秒")
 
     # 1. 日本時間 (JST) の設定
     t_delta = datetime.timedelta(hours=9)
@@ -28,7 +229,7 @@ def main():
     date_str = now.strftime('%Y-%m-%d')
     time_str = now.strftime('%Y-%m-%d %H:%M')
 
-    print(f"🕒 日本時間: {time_str} の更新を開始します")
+    print(f"🕒 日本時間: {time_str} の更新を開始します (対象: {', '.join(args.sections)})")
 
     # 2. 過去のアーカイブ一覧を取得
     archive_dates = []
@@ -39,149 +240,98 @@ def main():
     if date_str not in archive_dates:
         archive_dates.insert(0, date_str)
 
-    # 3. データの収集
-    
-    # --- [TOP / AIニュース] ---
-    print("📰 ニュースデータ取得中...")
-    try:
-        news_result = fetch_news.generate_news()
-        if isinstance(news_result, dict):
-            news_column = news_result.get('column', '')
-            news_articles = news_result.get('articles', [])
-            # ★追加: ワードクラウド画像ファイル名を取得
-            news_wordcloud = news_result.get('wordcloud', None) 
-        else:
-            news_column = news_result
-            news_articles = []
-            news_wordcloud = None
-    except Exception as e:
-        print(f"ニュース取得エラー: {e}")
-        news_column = "取得エラー"
-        news_articles = []
-        news_wordcloud = None
-    
-    print("☕ 30秒休憩中...(API制限を確実に回避)")
-    time.sleep(30)
+    # 3. データの収集 (独立したソースは並列に取得)
+    sources = [source for source in SOURCES if source["section"] in args.sections]
+    results, timings = run_sources(sources)
 
-    # --- [Market / 株価] ---
-    print("📈 株価データ取得中...")
-    try:
-        market_data = fetch_market.generate_market_report()
-    except Exception as e:
-        print(f"株価取得エラー: {e}")
-        market_data = {"summary": "取得エラー", "data": {}}
+    # 失敗したソースは、最後に正常に取得できた日のスナップショットで補う
+    for name, timing in timings.items():
+        if timing["status"] in ("ok", "partial"):
+            continue
+        found = snapshot.find_last_good(ARCHIVE_ROOT, name, archive_dates)
+        if found:
+            fallback_date, results[name] = found
+            timing["status"] = "fallback"
+            timing["fallback_date"] = fallback_date
+            print(f"♻️ {name}: {fallback_date} のデータで代用します")
 
-    print("☕ 30秒休憩中...(API制限を確実に回避)")
-    time.sleep(30)
+    # 4. アーカイブの準備
+    today_archive_dir = os.path.join(ARCHIVE_ROOT, date_str)
+    os.makedirs(today_archive_dir, exist_ok=True)
 
-    # --- [Animal / 動物] ---
-    print("🦁 動物コラム生成中...")
-    try:
-        animal_data = fetch_animal.generate_animal_column()
-    except Exception as e:
-        print(f"動物取得エラー: {e}")
-        animal_data = {"columns": []}
-    
-    print("☕ 30秒休憩中...(API制限を確実に回避)")
-    time.sleep(30)
+    print(f"📂 本日のアーカイブを作成中: {today_archive_dir}")
+    write_archive_manifest(archive_dates)
 
-    # --- [NASA / 宇宙] ---
-    print("🚀 NASAデータを取得中...")
-    try:
-        nasa_data = fetch_nasa.get_nasa_data()
-        if animal_data:
-            animal_data['nasa'] = nasa_data
-    except Exception as e:
-        print(f"NASA取得エラー: {e}")
-    
-    print("☕ 30秒休憩中...(API制限を確実に回避)")
-    time.sleep(30)
-    
-    # --- [Entertainment / エンタメ] ---
-    print("📚 エンタメデータ取得中...")
+    # ワードクラウド画像は内容ハッシュ名で assets/ に置き、最新版とアーカイブ版で共有する
+    news_result = results.get("news")
+    news_wordcloud = news_result.get("wordcloud") if isinstance(news_result, dict) else None
+    if news_wordcloud and os.path.exists(news_wordcloud):
+        try:
+            news_result["wordcloud"] = assets.store_file(news_wordcloud)
+            print(f"✅ ワードクラウド画像を保存しました: {news_result['wordcloud']}")
+        except Exception as e:
+            print(f"画像保存エラー: {e}")
+            news_result["wordcloud"] = None
+
+    # 外部の画像は一度だけダウンロードし、縮小版の WebP を assets/img/ に置く
     try:
-        ent_data = fetch_entertainment.get_entertainment_info()
+        with tracing.span("images", "images"):
+            images.localize(results)
     except Exception as e:
-        print(f"エンタメ取得エラー: {e}")
-        ent_data = {"manga": [], "anime": []}
-
-    print("☕ 10秒休憩中...")
-    time.sleep(10) 
+        print(f"画像処理エラー: {e}")
 
-    # --- [Lifestyle / 天気・占い] ---
-    print("☀️ 生活情報データを取得中...")
+    # 取得結果をスナップショットとして残す (API を呼ばずに再描画・代用できるように)
     try:
-        lifestyle_data = fetch_lifestyle.get_lifestyle_data()
+        with tracing.span("snapshot", "write"):
+            snapshot.save(today_archive_dir, date_str, time_str, results, timings)
     except Exception as e:
-        print(f"生活情報取得エラー: {e}")
-        lifestyle_data = {"weather": None, "fortune": [], "weather_list": []}
+        print(f"スナップショット保存エラー: {e}")
 
-
-    # 4. HTMLの生成設定
-    env = Environment(loader=FileSystemLoader('templates'))
+    # 5. HTMLの生成 (1回だけ描画し、最新版とアーカイブ版を書き出す)
+    env = render.create_environment('templates')
     
     common_context = {
-        "update_time": time_str,
-        "archive_list": archive_dates,
-        "is_archive": False
+        "update_time": time_str
     }
 
-    pages = [
-        # ★修正: wordcloud をテンプレートに渡す
-        ("index.html", "AI News", "index", {"column": news_column, "article_list": news_articles, "wordcloud": news_wordcloud}),
-        ("market.html", "Market", "market", market_data),
-        ("animal.html", "Animal", "animal", animal_data),
-        ("entertainment.html", "Entertainment", "entertainment", {"manga_list": ent_data['manga'], "anime_list": ent_data['anime']}),
-        ("lifestyle.html", "Lifestyle", "lifestyle", lifestyle_data)
-    ]
-
-    # (A) 最新版の生成
-    for filename, title, active_tab, context in pages:
+    for filename, title, active_tab, section, context in render.build_pages(results):
         try:
-            template = env.get_template(filename)
-            html = template.render(
-                title=title,
-                active_tab=active_tab,
-                **context,
-                **common_context
-            )
-            with open(f'{OUTPUT_DIR}/{filename}', 'w', encoding='utf-8') as f:
-                f.write(html)
+            with tracing.span(f"render {filename}", "render"):
+                html = render.render_page(env, filename, title, active_tab, context, common_context)
         except Exception as e:
             print(f"HTML生成エラー ({filename}): {e}")
+            continue
 
-    # 5. アーカイブの保存
-    today_archive_dir = os.path.join(ARCHIVE_ROOT, date_str)
-    os.makedirs(today_archive_dir, exist_ok=True)
-
-    print(f"📂 本日のアーカイブを作成中: {today_archive_dir}")
-
-    # ★追加: ワードクラウド画像があれば、アーカイブフォルダにもコピーする
-    if news_wordcloud and os.path.exists(news_wordcloud):
-        try:
-            shutil.copy(news_wordcloud, os.path.join(today_archive_dir, news_wordcloud))
-            print("✅ ワードクラウド画像をアーカイブに保存しました")
-        except Exception as e:
-            print(f"画像コピーエラー: {e}")
+        for output_dir, is_archive in ((OUTPUT_DIR, False), (today_archive_dir, True)):
+            try:
+                with tracing.span(f"write {filename}", "write", archive=is_archive) as attrs:
+                    stats = render.write_page(
+                        os.path.join(output_dir, filename),
+                        render.resolve_links(html, is_archive),
+                        precompress=args.precompress
+                    )
+                    attrs.update(stats)
+                if not is_archive:
+                    print(render.format_size_report(filename, stats))
+            except Exception as e:
+                print(f"HTML書き込みエラー ({output_dir}/{filename}): {e}")
 
-    # (B) アーカイブ版の生成
-    common_context["is_archive"] = True
-    
-    for filename, title, active_tab, context in pages:
-        try:
-            template = env.get_template(filename)
-            html = template.render(
-                title=title,
-                active_tab=active_tab,
-                **context,
-                **common_context
-            )
-            with open(f'{today_archive_dir}/{filename}', 'w', encoding='utf-8') as f:
-                f.write(html)
-        except Exception as e:
-            print(f"アーカイブ生成エラー ({filename}): {e}")
+    # 6. ビルドレポート (処理ごとの内訳) をアーカイブに残す
+    try:
+        report = tracing.write_report(
+            os.path.join(today_archive_dir, BUILD_REPORT_FILE),
+            date=date_str, update_time=time_str, sections=args.sections, sources=timings,
+            llm_usage=ai_client.get_usage()
+        )
+        print(f"📝 ビルドレポート: {report['total_seconds']:.1f}秒 / HTTP {report['http']['requests']}回 "
+              f"({report['http']['bytes'] / 1024:.0f}KB) / Gemini {report['llm']['calls']}回")
+        if args.trace:
+            tracing.write_chrome_trace(args.trace)
+            print(f"📝 トレースを書き出しました: {args.trace}")
+    except Exception as e:
+        print(f"ビルドレポート書き込みエラー: {e}")
 
     print("✅ サイト生成とアーカイブ保存が完了しました！")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
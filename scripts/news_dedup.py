@@ -0,0 +1,54 @@
+import re
+import unicodedata
+
+# --- 設定エリア --------------------------
+# 見出しを何文字ずつに区切って比べるか (日本語の見出しは2文字が一番区別しやすい)
+SHINGLE_SIZE = 2
+# この類似度 (Jaccard係数) 以上の見出しは同じニュースとみなす
+SIMILARITY_THRESHOLD = 0.4
+# ----------------------------------------
+
+def strip_source(title, source=None):
+    """Googleニュースの見出し末尾に付く「 - 配信元」を取り除く"""
+    if source and title.endswith(f" - {source}"):
+        return title[:-len(source) - 3]
+    head, sep, _ = title.rpartition(" - ")
+    return head if sep else title
+
+def shingles(title, source=None):
+    """見出しを正規化し、SHINGLE_SIZE 文字ずつの断片の集合にする"""
+    text = unicodedata.normalize("NFKC", strip_source(title, source)).lower()
+    text = re.sub(r"[\W_]+", "", text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def entry_source(entry):
+    source = entry.get("source")
+    return source.get("title") if source else None
+
+def cluster_entries(entries, threshold=SIMILARITY_THRESHOLD):
+    """ほぼ同じ見出しの記事をまとめ、[[代表の記事, 似た記事, ...], ...] を返す
+    フィードの並び順を保ち、各まとまりの最初の記事を代表とする"""
+    clusters = []
+    for entry in entries:
+        entry_shingles = shingles(entry.title, entry_source(entry))
+        for cluster in clusters:
+            if similarity(entry_shingles, cluster["shingles"]) >= threshold:
+                cluster["entries"].append(entry)
+                break
+        else:
+            clusters.append({"shingles": entry_shingles, "entries": [entry]})
+    return [cluster["entries"] for cluster in clusters]
+
+def pick_distinct(entries, limit, threshold=SIMILARITY_THRESHOLD):
+    """重複をまとめたうえで、別々のニュースの代表記事を最大 limit 件返す"""
+    clusters = cluster_entries(entries, threshold)
+    merged = len(entries) - len(clusters)
+    print(f"🧹 重複記事をまとめました: {len(entries)}件 → {len(clusters)}件 (重複 {merged}件)")
+    return [cluster[0] for cluster in clusters[:limit]]
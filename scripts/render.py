@@ -0,0 +1,244 @@
+import os
+import re
+import gzip
+import time
+from concurrent.futures import ProcessPoolExecutor
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+import fileio
+import snapshot
+
+# テンプレート内でサイトのルートを指す印。1回だけ描画し、書き出すときに置き換える
+ROOT_MARKER = "@@ROOT@@"
+# 最新版とアーカイブ版それぞれでのルートへのパス
+LIVE_ROOT = ""
+ARCHIVE_ROOT = "../../"
+
+# アーカイブ版にだけ残す部分 (例: 「最新の記事へ戻る」リンク)
+ARCHIVE_ONLY = re.compile(r"<!--archive-only-->(.*?)<!--/archive-only-->", re.S)
+
+# テンプレートのコンパイル結果の置き場 (再描画で全プロセスが使い回す)
+BYTECODE_CACHE_DIR = os.path.join(".cache", "jinja")
+
+def create_environment(template_dir="templates", bytecode_cache=False):
+    options = {}
+    if bytecode_cache:
+        os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+        options["bytecode_cache"] = FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
+    return Environment(loader=FileSystemLoader(template_dir), **options)
+
+def build_pages(results):
+    """取得結果から (ファイル名, タイトル, タブ, セクション, テンプレート用データ) の一覧を作る
+    results に含まれないセクションのページは作らない"""
+    pages = []
+
+    if "news" in results:
+        news_result = results["news"]
+        if isinstance(news_result, dict):
+            news_column = news_result.get('column', '')
+            news_articles = news_result.get('articles', [])
+            # ★追加: ワードクラウド画像ファイル名を取得
+            news_wordcloud = news_result.get('wordcloud', None)
+        else:
+            news_column = news_result
+            news_articles = []
+            news_wordcloud = None
+        pages.append(("index.html", "AI News", "index", "news",
+                      {"column": news_column, "article_list": news_articles, "wordcloud": news_wordcloud}))
+
+    if "market" in results:
+        pages.append(("market.html", "Market", "market", "market", results["market"]))
+
+    if "animal" in results:
+        animal_data = dict(results["animal"] or {"columns": []})
+        if results.get("nasa"):
+            animal_data['nasa'] = results["nasa"]
+        pages.append(("animal.html", "Animal", "animal", "animal", animal_data))
+
+    if "entertainment" in results:
+        ent_data = results["entertainment"]
+        pages.append(("entertainment.html", "Entertainment", "entertainment", "entertainment",
+                      {"manga_list": ent_data['manga'], "anime_list": ent_data['anime']}))
+
+    if "lifestyle" in results:
+        pages.append(("lifestyle.html", "Lifestyle", "lifestyle", "lifestyle", results["lifestyle"]))
+
+    return pages
+
+def render_page(env, filename, title, active_tab, context, common_context):
+    """ページを1回だけ描画する (リンクは ROOT_MARKER のまま)"""
+    template = env.get_template(filename)
+    return template.render(
+        title=title,
+        active_tab=active_tab,
+        root=ROOT_MARKER,
+        **context,
+        **common_context
+    )
+
+def resolve_links(html, is_archive):
+    """描画済みのHTMLから、最新版またはアーカイブ版を作る"""
+    if is_archive:
+        html = ARCHIVE_ONLY.sub(r"\1", html)
+        return html.replace(ROOT_MARKER, ARCHIVE_ROOT)
+    html = ARCHIVE_ONLY.sub("", html)
+    return html.replace(ROOT_MARKER, LIVE_ROOT)
+
+def write_atomic(path, text):
+    """一時ファイルに書いてから置き換える (途中で止まっても書きかけのページが残らない)"""
+    fileio.write_bytes_atomic(path, text.encode('utf-8'))
+
+# --- 圧縮 (ミニファイ・事前圧縮) ---------
+
+# 中身の空白に意味があるため、HTMLとしての空白の詰め方をしない要素
+PROTECTED_BLOCK = re.compile(r"(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+
+def _minify_script(code):
+    """行頭・行末の空白、空行、行全体のコメントだけを取り除く
+    (改行は残すので、セミコロン省略や文字列の中身が壊れることはない)"""
+    lines = []
+    for line in code.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines)
+
+def _minify_style(css):
+    css = CSS_COMMENT.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).strip()
+
+def _collapse_whitespace(html):
+    # 改行を含む空白は改行1つに、それ以外は空白1つにまとめる
+    return re.sub(r"\s+", lambda m: "\n" if "\n" in m.group(0) else " ", html)
+
+def minify_html(html):
+    """HTMLとインラインのCSS/JSから、表示に影響しない空白やコメントを取り除く"""
+    parts = []
+    last = 0
+    for m in PROTECTED_BLOCK.finditer(html):
+        parts.append(_collapse_whitespace(HTML_COMMENT.sub("", html[last:m.start()])))
+        open_tag, tag, body, close_tag = m.group(1), m.group(2).lower(), m.group(3), m.group(4)
+        if tag == "script":
+            body = _minify_script(body)
+        elif tag == "style":
+            body = _minify_style(body)
+        parts.append(f"{_collapse_whitespace(open_tag)}{body}{close_tag}")
+        last = m.end()
+    parts.append(_collapse_whitespace(HTML_COMMENT.sub("", html[last:])))
+    return "".join(parts).strip() + "\n"
+
+def _write_compressed(path, data):
+    """.gz と (brotli があれば) .br を横に書き出し、それぞれのサイズを返す"""
+    sizes = {}
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    fileio.write_bytes_atomic(f"{path}.gz", gz_data)
+    sizes["gzip"] = len(gz_data)
+
+    try:
+        import brotli
+    except ImportError:
+        return sizes
+    br_data = brotli.compress(data, quality=11)
+    fileio.write_bytes_atomic(f"{path}.br", br_data)
+    sizes["br"] = len(br_data)
+    return sizes
+
+def write_page(path, html, minify=True, precompress=False):
+    """ページを書き出す (ミニファイ → 変更があれば書き込み → 必要なら事前圧縮)
+    {"written": 書き込んだか, "raw": 元のサイズ, "html": 書き出したサイズ, "gzip": ..., "br": ...} を返す"""
+    stats = {"raw": len(html.encode('utf-8'))}
+    if minify:
+        html = minify_html(html)
+    data = html.encode('utf-8')
+    stats["html"] = len(data)
+    stats["written"] = write_if_changed(path, html)
+
+    if precompress and (stats["written"] or not os.path.exists(f"{path}.gz")):
+        stats.update(_write_compressed(path, data))
+    return stats
+
+def format_size_report(filename, stats):
+    line = f"📦 {filename}: {stats['raw'] / 1024:.1f}KB → {stats['html'] / 1024:.1f}KB"
+    compressed = [f"{name} {stats[name] / 1024:.1f}KB" for name in ("gzip", "br") if name in stats]
+    if compressed:
+        line += f" ({' / '.join(compressed)})"
+    return line
+
+def write_if_changed(path, text):
+    """内容が変わったときだけ書き込む (書き込んだら True)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    write_atomic(path, text)
+    return True
+
+# --- アーカイブの一括再描画 ---------------
+
+_worker_env = None
+_worker_precompress = False
+
+def _init_worker(template_dir, precompress):
+    global _worker_env, _worker_precompress
+    _worker_env = create_environment(template_dir, bytecode_cache=True)
+    _worker_precompress = precompress
+
+def _rerender_day(task):
+    """1日分のスナップショットから全ページを描画し直し、(日付, 書き込み数, 変更なし数, エラー) を返す"""
+    archive_dir, output_dirs = task
+    date_str = os.path.basename(archive_dir)
+    data = snapshot.load(archive_dir)
+    if not data:
+        return date_str, 0, 0, "スナップショットなし"
+
+    written = unchanged = 0
+    common_context = {"update_time": data.get("update_time", date_str)}
+    try:
+        for filename, title, active_tab, section, context in build_pages(data["sources"]):
+            html = render_page(_worker_env, filename, title, active_tab, context, common_context)
+            for output_dir, is_archive in output_dirs:
+                path = os.path.join(output_dir, filename)
+                if write_page(path, resolve_links(html, is_archive), precompress=_worker_precompress)["written"]:
+                    written += 1
+                else:
+                    unchanged += 1
+    except Exception as e:
+        return date_str, written, unchanged, str(e)
+    return date_str, written, unchanged, None
+
+def rerender_archives(archive_root, template_dir="templates", output_dir=".", workers=None, precompress=False):
+    """保存済みのスナップショットを使い、全アーカイブ日のページを複数プロセスで描画し直す
+    最新の日のページはサイトのルートにも書き出す"""
+    start = time.perf_counter()
+    dates = sorted(
+        (d for d in os.listdir(archive_root) if os.path.isdir(os.path.join(archive_root, d))),
+        reverse=True
+    )
+
+    tasks = []
+    for i, date_str in enumerate(dates):
+        archive_dir = os.path.join(archive_root, date_str)
+        output_dirs = [(archive_dir, True)]
+        if i == 0:
+            output_dirs.append((output_dir, False))
+        tasks.append((archive_dir, output_dirs))
+
+    written = unchanged = skipped = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template_dir, precompress)) as executor:
+        for date_str, day_written, day_unchanged, error in executor.map(_rerender_day, tasks, chunksize=8):
+            written += day_written
+            unchanged += day_unchanged
+            if error:
+                skipped += 1
+                if error != "スナップショットなし":
+                    print(f"再描画エラー ({date_str}): {error}")
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ 再描画完了: {len(dates) - skipped}/{len(dates)}日 / 更新 {written}ページ / 変更なし {unchanged}ページ ({elapsed:.1f}秒)")
+    if skipped:
+        print(f"ℹ️ スナップショットがない、または描画できなかった {skipped}日 はそのままです")
+    return written
@@ -0,0 +1,54 @@
+import os
+import json
+import fileio
+
+# スナップショットの形式のバージョン (中身の構造を変えたら上げて、load で移行する)
+SCHEMA_VERSION = 1
+SNAPSHOT_FILE = "data.json"
+
+# 失敗したソースの代わりを探すとき、さかのぼる日数の上限
+FALLBACK_SEARCH_DAYS = 14
+
+def snapshot_path(archive_dir):
+    return os.path.join(archive_dir, SNAPSHOT_FILE)
+
+def load(archive_dir):
+    """その日のスナップショットを読み込む (なければ、または読めない形式なら None)"""
+    try:
+        with open(snapshot_path(archive_dir), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("schema_version") != SCHEMA_VERSION:
+        print(f"⚠️ 未対応のスナップショット形式です: {archive_dir} (version {data.get('schema_version')})")
+        return None
+    return data
+
+def save(archive_dir, date_str, update_time, results, timings):
+    """各ソースの取得結果をスナップショットとして保存する
+    --sections で一部だけ実行した場合は、その日の既存のスナップショットに上書きでまとめる"""
+    snapshot = load(archive_dir) or {"sources": {}, "status": {}}
+    snapshot.update({
+        "schema_version": SCHEMA_VERSION,
+        "date": date_str,
+        "update_time": update_time
+    })
+    for name, data in results.items():
+        snapshot["sources"][name] = data
+        snapshot["status"][name] = timings.get(name, {}).get("status", "ok")
+
+    path = snapshot_path(archive_dir)
+    fileio.write_json_atomic(path, snapshot, separators=(',', ':'), default=str)
+    return path
+
+def find_last_good(archive_root, name, archive_dates):
+    """指定したソースが最後に正常に取得できた日のデータを探し、(日付, データ) を返す
+    Geminiの予算超過で一部を省略した日 (status が "partial") は正常とみなさない"""
+    for date_str in archive_dates[:FALLBACK_SEARCH_DAYS]:
+        snapshot = load(os.path.join(archive_root, date_str))
+        if not snapshot:
+            continue
+        if snapshot["status"].get(name) == "ok" and snapshot["sources"].get(name) is not None:
+            return date_str, snapshot["sources"][name]
+    return None
@@ -0,0 +1,151 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+import fileio
+
+# 処理の区間 (span) を記録し、ビルドレポートやトレースファイルにまとめる
+# 記録はプロセス内のリストに追記するだけなので、常に有効にしておく
+
+_origin = time.perf_counter()
+_spans = []
+_lock = threading.Lock()
+
+@contextmanager
+def span(name, category, **attrs):
+    """with で囲んだ区間の所要時間を記録する
+    yield した dict に値を入れると、その区間の属性 (転送量・再試行回数など) として残る"""
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        record = {
+            "name": name,
+            "cat": category,
+            "start": start - _origin,
+            "seconds": end - start,
+            "thread": threading.current_thread().name,
+            "attrs": attrs
+        }
+        with _lock:
+            _spans.append(record)
+
+def reset():
+    """記録を消し、時刻の起点を今にする (1回のビルドの始めに呼ぶ)"""
+    global _origin
+    with _lock:
+        _spans.clear()
+        _origin = time.perf_counter()
+
+def sleep(seconds, reason):
+    """待ち時間も区間として残す time.sleep"""
+    with span(f"sleep: {reason}", "wait", seconds=seconds):
+        time.sleep(seconds)
+
+def get_spans():
+    with _lock:
+        return list(_spans)
+
+def _summarize(spans):
+    by_category = {}
+    for s in spans:
+        entry = by_category.setdefault(s["cat"], {"count": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] = round(entry["seconds"] + s["seconds"], 3)
+
+    http = [s["attrs"] for s in spans if s["cat"] == "http"]
+    revalidated = sum(1 for a in http if a.get("revalidated"))
+    llm = [s["attrs"] for s in spans if s["cat"] == "llm"]
+    cache_hits = sum(1 for a in llm if a.get("cache_hit"))
+
+    return {
+        "stages": by_category,
+        "http": {
+            "requests": len(http),
+            "bytes": sum(a.get("bytes", 0) for a in http),
+            "revalidated": revalidated,
+            "revalidated_rate": round(revalidated / len(http), 3) if http else None,
+            "errors": sum(1 for a in http if a.get("error") or a.get("status", 200) >= 400)
+        },
+        "llm": {
+            "calls": len(llm) - cache_hits,
+            "cache_hits": cache_hits,
+            "cache_hit_rate": round(cache_hits / len(llm), 3) if llm else None,
+            "retries": sum(a.get("retries", 0) for a in llm),
+            "wait_seconds": round(sum(a.get("wait_seconds", 0.0) for a in llm), 3),
+            "tokens": sum(a.get("tokens", 0) for a in llm)
+        }
+    }
+
+def build_report(**extra):
+    """記録した区間をまとめたビルドレポート (dict) を作る"""
+    spans = get_spans()
+    report = dict(extra)
+    report["total_seconds"] = round(time.perf_counter() - _origin, 3)
+    report.update(_summarize(spans))
+    report["spans"] = [
+        {**s, "start": round(s["start"], 4), "seconds": round(s["seconds"], 4)}
+        for s in sorted(spans, key=lambda s: s["start"])
+    ]
+    return report
+
+def _load_report(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_report(path, **extra):
+    """ビルドレポートをJSONで書き出し、この実行の分のレポートを返す
+
+    同じファイルに前の実行のレポートがあれば、runs に実行ごとのレポートを並べてまとめる
+    (--sections で一部だけ再実行しても、その日の前の実行の記録は消えない)。
+    一番上には extra の値を置き、dict の値 (sources など) は前の実行の分に上書きで、
+    list の値 (sections など) は重複を除いて足し合わせてまとめる。
+    """
+    report = build_report(**extra)
+    existing = _load_report(path)
+    # runs がないのは、実行ごとにまとめる前の形式 (1回分のレポートそのもの)
+    runs = existing.get("runs", [existing] if existing else [])
+    runs.append(report)
+
+    merged = {}
+    for run in runs:
+        for key in extra:
+            if isinstance(run.get(key), dict):
+                merged[key] = {**merged.get(key, {}), **run[key]}
+            elif isinstance(run.get(key), list):
+                merged[key] = list(dict.fromkeys(merged.get(key, []) + run[key]))
+            elif key in run:
+                merged[key] = run[key]
+    merged["runs"] = runs
+    fileio.write_json_atomic(path, merged, indent=1, default=str)
+    return report
+
+def write_chrome_trace(path):
+    """Chrome の Trace Event 形式で書き出す (chrome://tracing, Perfetto, speedscope で開ける)"""
+    spans = get_spans()
+    threads = {name: i for i, name in enumerate(dict.fromkeys(s["thread"] for s in spans))}
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+        for name, tid in threads.items()
+    ]
+    events += [
+        {
+            "name": s["name"],
+            "cat": s["cat"],
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["seconds"] * 1e6),
+            "pid": 1,
+            "tid": threads[s["thread"]],
+            "args": s["attrs"]
+        }
+        for s in spans
+    ]
+    fileio.write_json_atomic(path, {"traceEvents": events, "displayTimeUnit": "ms"}, separators=(',', ':'), default=str)
@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import Counter
+import font_cache
+import tracing
+
+# --- 設定エリア --------------------------
+# 描画済み画像の置き場 (頻度表のハッシュ名で保存し、同じ単語の組み合わせなら描画を省略する)
+CACHE_DIR = os.path.join(".cache", "wordcloud")
+# 残しておく描画済み画像の数
+CACHE_KEEP = 30
+
+# 画像の設定 (変更すると頻度表が同じでも描き直しになる)
+IMAGE_OPTIONS = {
+    "width": 800,
+    "height": 400,
+    "background_color": "white",
+    "colormap": "viridis"  # 色使い
+}
+# ----------------------------------------
+
+# 辞書の読み込みが重いため、Tokenizer はプロセス内で1つだけ作って使い回す
+# (janome / wordcloud 自体の読み込みも重いので、使うときまで import しない)
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            from janome.tokenizer import Tokenizer
+            _tokenizer = Tokenizer()
+        return _tokenizer
+
+def count_nouns(text_list, stop_words=()):
+    """形態素解析で名詞だけを数え、{単語: 出現回数} を返す"""
+    tokenizer = get_tokenizer()
+    stop_words = set(stop_words)
+    counts = Counter()
+
+    with _tokenizer_lock, tracing.span("tokenize", "cpu", texts=len(text_list)):
+        # Janome の Tokenizer はスレッドセーフではないため、解析中はロックしておく
+        for text in text_list:
+            for token in tokenizer.tokenize(text):
+                if token.part_of_speech.split(',')[0] == '名詞' and token.surface not in stop_words:
+                    counts[token.surface] += 1
+
+    return counts
+
+def frequency_hash(frequencies, font_url=None):
+    """頻度表と描画設定から、画像を一意に決めるハッシュを作る"""
+    payload = json.dumps(
+        [sorted(frequencies.items()), IMAGE_OPTIONS, font_url],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _prune_cache():
+    try:
+        paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.endswith(".png")]
+    except OSError:
+        return
+    for path in sorted(paths, key=os.path.getmtime, reverse=True)[CACHE_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def render(frequencies, output_filename, font_url=None):
+    """頻度表からワードクラウド画像を作る。同じ頻度表の画像が既にあれば描画を省略する
+    フォントは描画が必要なときだけ取得し、よく使う文字だけに絞ったサブセットを読み込む"""
+    key = frequency_hash(frequencies, font_url)
+    cached_path = os.path.join(CACHE_DIR, f"{key}.png")
+
+    if os.path.exists(cached_path):
+        print("☁️ 単語の出現頻度が前回と同じため、描画を省略します")
+        os.utime(cached_path)
+    else:
+        font_path = font_cache.get_font(font_url) if font_url else None
+        if font_path:
+            font_path = font_cache.subset_font(font_path, "".join(frequencies))
+
+        from wordcloud import WordCloud
+        with tracing.span("wordcloud render", "cpu", words=len(frequencies)):
+            wc = WordCloud(font_path=font_path, **IMAGE_OPTIONS)
+            wc.generate_from_frequencies(frequencies)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_path}.tmp.png"
+        wc.to_file(tmp_path)
+        os.replace(tmp_path, cached_path)
+        _prune_cache()
+
+    shutil.copyfile(cached_path, output_filename)
+    return output_filename